@@ -0,0 +1,262 @@
+"""
+Async variants of the catalog, auth and Google login endpoints, served
+under ``/api/async/`` and meant for ``backend.asgi``.
+
+DRF views are synchronous, so these are plain Django async views that
+return the same JSON as their DRF counterparts. Queries go through the
+async ORM. Work that only exists in sync form (issuing refresh tokens,
+the blacklist check, Google token verification with its certificate
+fetch) runs through ``sync_to_async``; the Google call is not thread
+sensitive, so a slow response from Google only ties up a pool thread
+while the event loop keeps serving other requests.
+
+Django still runs the queries themselves on one thread per process, so
+the gain is for requests that spend their time waiting on something
+other than the database.
+"""
+
+import hashlib
+import io
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate, get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.tokens import TokenError
+
+from core.catalog import get_version
+from core.google_auth import verify_google_id_token
+from core.models import Resource, Tag
+from core.tokens import AccessToken, RefreshToken
+
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .serializers import ResourceRowSerializer, TagSerializer
+
+
+User = get_user_model()
+
+INVALID_CREDENTIALS = {
+    "message": "Authentication credentials were not provided or are invalid"
+}
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status,
+        content_type="application/json",
+    )
+
+
+def parse_body(request):
+    data = FastJSONParser().parse(io.BytesIO(request.body)) if request.body else {}
+    if not isinstance(data, dict):
+        raise ParseError("Expected a JSON object.")
+    return data
+
+
+def set_auth_cookies(response, access, refresh):
+    response.set_cookie(
+        key="access_token",
+        value=str(access),
+        httponly=True,
+        secure=True,
+        samesite="None",
+        max_age=30 * 60,
+    )
+    response.set_cookie(
+        key="refresh_token",
+        value=str(refresh),
+        httponly=True,
+        secure=True,
+        samesite="None",
+        max_age=7 * 24 * 60 * 60,
+    )
+
+
+def page_link(request, number):
+    url = request.build_absolute_uri()
+    if number == 1:
+        return remove_query_param(url, "page")
+    return replace_query_param(url, "page", number)
+
+
+async def catalog_page(request, cache_prefix, queryset, serialize):
+    """
+    A ``PageNumberPagination`` page of ``queryset``, cached under the
+    catalog version like ``CatalogCacheMixin`` does.
+    """
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f"catalog:{await sync_to_async(get_version)()}:{cache_prefix}:{path}"
+    data = await cache.aget(key) if settings.CATALOG_CACHE_TIMEOUT else None
+    if data is not None:
+        response = json_response(data)
+        response["X-Cache"] = "HIT"
+        return response
+
+    page_size = PageNumberPagination.page_size
+    count = await queryset.acount()
+    try:
+        number = int(request.GET.get("page", 1))
+        if number < 1 or (number > 1 and (number - 1) * page_size >= count):
+            raise ValueError
+    except ValueError:
+        return json_response({"detail": "Invalid page."}, status=404)
+
+    offset = (number - 1) * page_size
+    items = [item async for item in queryset[offset : offset + page_size]]
+    data = {
+        "count": count,
+        "next": (
+            page_link(request, number + 1) if offset + page_size < count else None
+        ),
+        "previous": page_link(request, number - 1) if number > 1 else None,
+        "results": await serialize(items),
+    }
+
+    if settings.CATALOG_CACHE_TIMEOUT:
+        await cache.aset(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    response = json_response(data)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+async def serialize_resources(rows):
+    serializer = ResourceRowSerializer()
+    tag_rows = [row async for row in serializer.tag_rows(rows)]
+    return serializer.build(rows, tag_rows)
+
+
+async def serialize_tags(tags):
+    return TagSerializer(tags, many=True).data
+
+
+@require_GET
+async def resource_list(request):
+    return await catalog_page(
+        request,
+        "async-resources",
+        Resource.objects.order_by("id").values(*ResourceRowSerializer.values),
+        serialize_resources,
+    )
+
+
+@require_GET
+async def tag_list(request):
+    return await catalog_page(
+        request, "async-tags", Tag.objects.order_by("id"), serialize_tags
+    )
+
+
+def issue_tokens(user):
+    return AccessToken.for_user(user), RefreshToken.for_user(user)
+
+
+def rotate_refresh_token(refresh_token):
+    """New (access, refresh) for a valid refresh token, which is blacklisted."""
+    refresh = RefreshToken(refresh_token)
+    try:
+        user = User.objects.get(id=refresh["user_id"], is_active=True)
+    except User.DoesNotExist:
+        raise TokenError("User not found")
+
+    new_refresh = RefreshToken.for_user(user)
+    try:
+        refresh.blacklist()
+    except Exception:
+        pass
+    return new_refresh.access_token, new_refresh
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    try:
+        data = parse_body(request)
+    except ParseError as e:
+        return json_response({"detail": str(e)}, status=400)
+
+    errors = {
+        field: ["This field is required."]
+        for field in ("email", "password")
+        if not data.get(field)
+    }
+    if errors:
+        return json_response(errors, status=400)
+
+    user = await aauthenticate(
+        request, email=data["email"], password=data["password"]
+    )
+    if not user:
+        return json_response(
+            {"non_field_errors": ["Invalid password or email!"]}, status=400
+        )
+
+    access, refresh = await sync_to_async(issue_tokens)(user)
+    response = json_response({"message": "successfully logged in!"})
+    set_auth_cookies(response, access, refresh)
+    return response
+
+
+@require_GET
+async def check_auth(request):
+    access_token = request.COOKIES.get("access_token")
+    refresh_token = request.COOKIES.get("refresh_token")
+
+    if access_token:
+        try:
+            AccessToken(access_token).verify()
+            return json_response({"message": "Access token valid"})
+        except TokenError:
+            pass
+
+    if not refresh_token:
+        return json_response(INVALID_CREDENTIALS, status=401)
+    try:
+        access, refresh = await sync_to_async(rotate_refresh_token)(refresh_token)
+    except TokenError:
+        return json_response(INVALID_CREDENTIALS, status=401)
+
+    response = json_response({"message": "Access token refreshed!"})
+    set_auth_cookies(response, access, refresh)
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def google_auth(request):
+    try:
+        token = parse_body(request).get("token")
+    except ParseError as e:
+        return json_response({"detail": str(e)}, status=400)
+    if not token:
+        return json_response({"message": "Token must be set!"}, status=400)
+
+    try:
+        idinfo = await sync_to_async(verify_google_id_token, thread_sensitive=False)(
+            token, os.getenv("GOOGLE_CLIENT_ID")
+        )
+    except ValueError:
+        return json_response({"message": "Invalid token"}, status=400)
+
+    email = idinfo["email"]
+    user, created = await User.objects.aget_or_create(
+        email=email, defaults={"username": idinfo.get("name", ""), "email": email}
+    )
+    if created:
+        user.set_unusable_password()
+        user.is_active = True
+        await user.asave()
+
+    access, refresh = await sync_to_async(issue_tokens)(user)
+    response = json_response(None)
+    set_auth_cookies(response, access, refresh)
+    return response
@@ -0,0 +1,200 @@
+"""
+Response caching and conditional GET support for the catalog endpoints.
+
+Serialized list responses are cached under the current catalog version
+(see ``core.catalog``) and the request's full path, so a cached page is
+reused until the ingest path, a rating write or an admin edit bumps the
+version. The same versions back the ETag and Last-Modified headers.
+
+Per-user fields are never cached: ``UserStateMixin`` adds them to the
+(possibly cached) anonymous page with two small queries.
+"""
+
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from core import rating_buffer
+from core.catalog import CATALOG, get_last_modified, get_version, saved_resources
+from core.models import UserRating, UserSavedResource
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+cache_stats = CacheStats()
+
+
+class CatalogCacheMixin:
+    """Caches ``list()`` responses of a view under the catalog version."""
+
+    cache_prefix = None
+
+    def get_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f"catalog:{get_version()}:{self.cache_prefix}:{path}"
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CATALOG_CACHE_TIMEOUT:
+            return super().list(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        cache_stats.record(hit=data is not None)
+
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Answers conditional GETs with 304 before the view does any work.
+
+    The ETag is derived from the catalog version (plus whatever
+    ``get_version_names`` adds) and the request path rather than from the
+    rendered body, and ``Last-Modified`` is the time of the last bump.
+    Responses carry ``Cache-Control: no-cache`` so that clients revalidate
+    instead of reusing a page the version has moved past; per-user pages
+    are also ``private`` and vary on the credentials.
+    """
+
+    version_names = (CATALOG,)
+    per_user = False
+
+    def get_version_names(self, request):
+        return self.version_names
+
+    def is_per_user(self, request):
+        return self.per_user
+
+    def get_etag(self, request):
+        versions = [get_version(name) for name in self.get_version_names(request)]
+        key = ":".join(map(str, versions + [request.get_full_path()]))
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    def get_last_modified(self, request):
+        return max(
+            get_last_modified(name) for name in self.get_version_names(request)
+        )
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified(request)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            if self.is_per_user(request):
+                patch_cache_control(response, no_cache=True, private=True)
+                patch_vary_headers(response, ("Cookie", "Authorization"))
+            else:
+                patch_cache_control(response, no_cache=True)
+        return response
+
+
+class UserStateMixin:
+    """
+    With ``?include_user_state=1``, adds ``is_saved`` and ``my_rating`` for
+    the authenticated user to every resource on the page.
+
+    Rating writes bump the catalog version, so the ETag only needs the
+    user's saved resources version on top of the catalog's. Buffered
+    ratings (``RATING_WRITE_BEHIND``) bump the user's version instead and
+    are shown from the buffer until they are flushed.
+    """
+
+    user_state_query_param = "include_user_state"
+
+    def wants_user_state(self, request):
+        return request.user.is_authenticated and request.query_params.get(
+            self.user_state_query_param
+        ) in ("1", "true")
+
+    def get_version_names(self, request):
+        names = super().get_version_names(request)
+        if self.wants_user_state(request):
+            names = (*names, saved_resources(request.user.id))
+        return names
+
+    def is_per_user(self, request):
+        return super().is_per_user(request) or self.wants_user_state(request)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and self.wants_user_state(request):
+            response.data = self.add_user_state(response.data, request.user.id)
+        return response
+
+    def add_user_state(self, data, user_id):
+        results = data["results"] if isinstance(data, dict) else data
+        ids = [item["id"] for item in results]
+
+        saved = set(
+            UserSavedResource.objects.filter(
+                user_id=user_id, is_saved=True, resource_id__in=ids
+            ).values_list("resource_id", flat=True)
+        )
+        ratings = dict(
+            UserRating.objects.filter(user_id=user_id, resource_id__in=ids).values_list(
+                "resource_id", "rating"
+            )
+        )
+        if settings.RATING_WRITE_BEHIND:
+            # Ratings the user submitted that have not been flushed yet.
+            ratings.update(rating_buffer.pending_ratings(user_id, ids))
+
+        # Build new dicts rather than touching the data that was cached.
+        results = [
+            {
+                **item,
+                "is_saved": item["id"] in saved,
+                "my_rating": ratings.get(item["id"]),
+            }
+            for item in results
+        ]
+        if isinstance(data, dict):
+            return {**data, "results": results}
+        return results
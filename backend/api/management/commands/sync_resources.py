@@ -0,0 +1,131 @@
+import contextlib
+import json
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.views import EXTERNAL_API_RESOURCES, EXTERNAL_API_TAGS
+from core.ingest import CatalogIngest
+from core.jsonstream import iter_json_array
+
+
+REQUEST_TIMEOUT = 30
+
+
+@contextlib.contextmanager
+def open_source(source):
+    """Open a local file or an http(s) URL as a binary stream."""
+    if source.startswith(("http://", "https://")):
+        try:
+            response = requests.get(source, stream=True, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise CommandError(f"Failed to fetch {source}: {e}")
+
+        response.raw.decode_content = True
+        with response:
+            yield response.raw
+        return
+
+    try:
+        stream = open(source, "rb")
+    except OSError as e:
+        raise CommandError(f"Failed to open {source}: {e}")
+
+    with stream:
+        yield stream
+
+
+class PhaseTimer:
+    """Splits the time spent in a phase between reading and writing."""
+
+    def __init__(self):
+        self.items = 0
+        self.read_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def track(self, iterable):
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.read_seconds += time.perf_counter() - started
+                return
+            self.read_seconds += time.perf_counter() - started
+            self.items += 1
+            yield item
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the upstream tag and resource catalogs into the database in "
+        "fixed-size batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tags",
+            default=EXTERNAL_API_TAGS,
+            help="URL or local path of the tags JSON array.",
+        )
+        parser.add_argument(
+            "--resources",
+            default=EXTERNAL_API_RESOURCES,
+            help="URL or local path of the resources JSON array.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--mark-stale",
+            action="store_true",
+            help="Flag resources missing from the upstream catalog as stale.",
+        )
+
+    def handle(self, *args, **options):
+        ingest = CatalogIngest(
+            batch_size=options["batch_size"], mark_stale=options["mark_stale"]
+        )
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            self._run_phase("tags", options["tags"], ingest.ingest_tags)
+            self._run_phase("resources", options["resources"], ingest.ingest_resources)
+
+            finish_started = time.perf_counter()
+            ingest.finish()
+            if options["mark_stale"]:
+                self.stdout.write(
+                    f"stale: {ingest.stale} resources marked in "
+                    f"{time.perf_counter() - finish_started:.2f}s"
+                )
+
+        summary = ingest.summary()
+        for name in ("tags", "resources"):
+            counts = ", ".join(f"{key}={value}" for key, value in summary[name].items())
+            self.stdout.write(f"{name}: {counts}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Sync finished in {time.perf_counter() - started:.2f}s")
+        )
+
+    def _run_phase(self, name, source, ingest_items):
+        timer = PhaseTimer()
+
+        with open_source(source) as stream:
+            try:
+                ingest_items(timer.track(iter_json_array(stream)))
+            except json.JSONDecodeError as e:
+                raise CommandError(f"Invalid JSON in {source}: {e}")
+
+        total = timer.total_seconds
+        self.stdout.write(
+            f"{name}: {timer.items} items in {total:.2f}s "
+            f"(fetch/parse {timer.read_seconds:.2f}s, "
+            f"write {total - timer.read_seconds:.2f}s)"
+        )
@@ -0,0 +1,155 @@
+"""
+In-process aggregation of the per-request numbers recorded by
+``api.middleware.RequestMetricsMiddleware``.
+
+Requests are grouped by URL route and method. Each group keeps response
+counts per status class and cumulative histograms of the total latency,
+the database time, the render time and the number of queries, in the
+shape Prometheus expects. Counters are per process and start from zero
+on every restart.
+"""
+
+import bisect
+import itertools
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = (
+    ("duration", "api_request_duration_seconds", "Total request latency."),
+    ("db", "api_request_db_duration_seconds", "Time spent running SQL queries."),
+    ("render", "api_request_render_duration_seconds", "Time spent rendering."),
+    ("queries", "api_request_queries", "SQL queries per request."),
+)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def as_dict(self):
+        cumulative = list(itertools.accumulate(self.counts))
+        return {
+            "buckets": {
+                **{str(le): count for le, count in zip(self.buckets, cumulative)},
+                "+Inf": cumulative[-1],
+            },
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.responses = {}
+        self.over_budget = 0
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.db = Histogram(LATENCY_BUCKETS)
+        self.render = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+
+    def observe(self, status_code, queries, db, render, duration, over_budget):
+        status_class = f"{status_code // 100}xx"
+        self.responses[status_class] = self.responses.get(status_class, 0) + 1
+        self.over_budget += over_budget
+        self.duration.observe(duration)
+        self.db.observe(db)
+        self.render.observe(render)
+        self.queries.observe(queries)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, method, status_code, queries, db, render, duration,
+               over_budget=False):
+        with self._lock:
+            metrics = self._views.get((view, method))
+            if metrics is None:
+                metrics = self._views[view, method] = ViewMetrics()
+            metrics.observe(status_code, queries, db, render, duration, over_budget)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "views": [
+                    {
+                        "view": view,
+                        "method": method,
+                        "responses": dict(metrics.responses),
+                        "over_budget": metrics.over_budget,
+                        **{
+                            name: getattr(metrics, name).as_dict()
+                            for name, _, _ in HISTOGRAMS
+                        },
+                    }
+                    for (view, method), metrics in sorted(self._views.items())
+                ]
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+
+request_metrics = RequestMetrics()
+
+
+def _labels(**labels):
+    def escape(value):
+        return (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+def format_prometheus(data):
+    """Render ``RequestMetrics.as_dict()`` in the Prometheus text format."""
+    views = data["views"]
+    lines = [
+        "# HELP api_requests_total Responses by route, method and status class.",
+        "# TYPE api_requests_total counter",
+    ]
+    for item in views:
+        for status_class, count in sorted(item["responses"].items()):
+            labels = _labels(
+                view=item["view"], method=item["method"], status=status_class
+            )
+            lines.append(f"api_requests_total{{{labels}}} {count}")
+
+    lines += [
+        "# HELP api_requests_over_query_budget_total Requests that ran more "
+        "queries than their budget.",
+        "# TYPE api_requests_over_query_budget_total counter",
+    ]
+    for item in views:
+        labels = _labels(view=item["view"], method=item["method"])
+        lines.append(
+            f"api_requests_over_query_budget_total{{{labels}}} {item['over_budget']}"
+        )
+
+    for key, metric, help_text in HISTOGRAMS:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for item in views:
+            histogram = item[key]
+            labels = _labels(view=item["view"], method=item["method"])
+            for le, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram['sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
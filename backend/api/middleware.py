@@ -0,0 +1,123 @@
+"""
+Per-request query counts and timings, enabled with ``REQUEST_METRICS``.
+
+For every request the middleware counts the SQL queries on all database
+connections and measures the time spent running them, the time spent
+rendering the response and the total time. The numbers are sent back in a
+``Server-Timing`` header and aggregated per route in
+``api.metrics.request_metrics``.
+
+A request that runs more queries than its budget (the view's
+``query_budget``, else ``REQUEST_QUERY_BUDGET``) is logged and counted.
+With ``REQUEST_QUERY_BUDGET_STRICT`` it raises ``QueryBudgetExceeded``
+instead, so an N+1 regression fails the test that makes the request.
+"""
+
+import contextlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import request_metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestTimer:
+    """``execute_wrapper`` that adds up the queries of one request."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        self.render += time.perf_counter() - self._render_started
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def server_timing(self, duration):
+        return (
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f"render;dur={self.render * 1000:.1f}, "
+            f"total;dur={duration * 1000:.1f}"
+        )
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = request._request_timer = RequestTimer(
+            settings.REQUEST_QUERY_BUDGET or None
+        )
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        request_metrics.record(
+            match.route if match else "<unmatched>",
+            request.method,
+            response.status_code,
+            timer.queries,
+            timer.db,
+            timer.render,
+            duration,
+            over_budget=timer.over_budget,
+        )
+        response["Server-Timing"] = timer.server_timing(duration)
+
+        if timer.over_budget:
+            message = (
+                f"{request.method} {request.path} ran {timer.queries} queries, "
+                f"over its budget of {timer.budget}"
+            )
+            if settings.REQUEST_QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(
+            getattr(view_func, "view_class", None), "query_budget", None
+        )
+        if budget is not None:
+            request._request_timer.budget = budget
+
+    def process_template_response(self, request, response):
+        # This middleware is listed first, so this hook runs last, right
+        # before the response is rendered.
+        timer = request._request_timer
+        timer.start_render()
+        response.add_post_render_callback(timer.finish_render)
+        return response
@@ -0,0 +1,213 @@
+"""
+Keyset (cursor) pagination for the resource list.
+
+Pages are selected with ``WHERE (key, id) > (last key, last id)`` on a
+stable ordering instead of ``OFFSET``, so deep pages cost the same as the
+first one, and no ``COUNT(*)`` is issued. The cursor is forward-only.
+
+Views may also return a sorted list of matching resource ids (e.g. from the
+tag index). The cursor is then applied to the list, so only a page worth
+of ids is sent to the database rather than the whole match set.
+"""
+
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.utils import chunked
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    ordering_query_param = "ordering"
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    # Ids per IN clause when a list of ids is ordered by another field.
+    id_batch_size = 500
+
+    # ordering name -> (model field, descending, nullable)
+    orderings = {
+        "id": ("id", False, False),
+        "-id": ("id", True, False),
+        "created_at": ("created_at", False, True),
+        "-created_at": ("created_at", True, True),
+        "rating": ("rating_avg", False, False),
+        "-rating": ("rating_avg", True, False),
+    }
+    default_ordering = "id"
+
+    invalid_cursor_message = "Invalid cursor"
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return (
+            params.get(cls.mode_query_param) == "cursor"
+            or cls.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        field, descending, nullable = self.orderings[self.ordering]
+        cursor = self.decode_cursor(request)
+
+        if isinstance(queryset, list):
+            results = self.get_id_page(
+                queryset, view.queryset, field, descending, nullable, cursor
+            )
+        else:
+            results = self.get_page(queryset, field, descending, nullable, cursor)
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        self.next_position = None
+        if self.has_next:
+            last = results[-1]
+            self.next_position = (
+                self.get_item_value(last, field),
+                self.get_item_value(last, "id"),
+            )
+
+        return results
+
+    def get_page(self, queryset, field, descending, nullable, cursor):
+        """The page after ``cursor`` plus one row, to tell if there is more."""
+        queryset = queryset.order_by(*self.get_order_by(field, descending, nullable))
+        if cursor is not None:
+            value, last_id = cursor
+            queryset = queryset.filter(
+                self.get_cursor_filter(field, descending, nullable, value, last_id)
+            )
+        return list(queryset[: self.page_size + 1])
+
+    def get_id_page(self, ids, queryset, field, descending, nullable, cursor):
+        """
+        ``get_page`` for a sorted list of ids. Ordered by id the page is cut
+        from the list itself; otherwise each batch of ids gives its own
+        page from ``queryset`` and the best rows of those pages are kept.
+        """
+        if field == "id":
+            if descending:
+                end = len(ids) if cursor is None else bisect_left(ids, cursor[1])
+                return ids[max(end - self.page_size - 1, 0) : end][::-1]
+            start = 0 if cursor is None else bisect_right(ids, cursor[1])
+            return ids[start : start + self.page_size + 1]
+
+        rows = []
+        for batch in chunked(ids, self.id_batch_size):
+            rows += self.get_page(
+                queryset.filter(pk__in=batch), field, descending, nullable, cursor
+            )
+        # Nulls sort first ascending and last descending, as in get_order_by.
+        rows.sort(
+            key=lambda row: (row[field] is not None, row[field], row["id"]),
+            reverse=descending,
+        )
+        return rows[: self.page_size + 1]
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.REST_FRAMEWORK["PAGE_SIZE"]
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+        return ordering if ordering in self.orderings else self.default_ordering
+
+    def get_order_by(self, field, descending, nullable=True):
+        if field == "id":
+            return ["-id" if descending else "id"]
+        if not nullable:
+            # No NULLS clause, so a plain (field, id) index can serve it.
+            return [f"-{field}", "-id"] if descending else [field, "id"]
+        if descending:
+            return [F(field).desc(nulls_last=True), "-id"]
+        return [F(field).asc(nulls_first=True), "id"]
+
+    def get_cursor_filter(self, field, descending, nullable, value, last_id):
+        after = "lt" if descending else "gt"
+        if field == "id":
+            return Q(**{f"id__{after}": last_id})
+
+        if value is None:
+            # Nulls sort first ascending and last descending.
+            after_nulls = Q(**{f"{field}__isnull": True, f"id__{after}": last_id})
+            if descending:
+                return after_nulls
+            return after_nulls | Q(**{f"{field}__isnull": False})
+
+        condition = Q(**{f"{field}__{after}": value}) | Q(
+            **{field: value, f"id__{after}": last_id}
+        )
+        if nullable and descending:
+            condition |= Q(**{f"{field}__isnull": True})
+        return condition
+
+    def get_item_value(self, item, field):
+        if isinstance(item, int):
+            return item
+        if isinstance(item, dict):
+            return item[field]
+        return getattr(item, field)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+
+        value, last_id = self.next_position
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        payload = json.dumps({"o": self.ordering, "v": value, "id": last_id})
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        url = replace_query_param(url, self.ordering_query_param, self.ordering)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            value, last_id = payload["v"], int(payload["id"])
+            if payload["o"] != self.ordering:
+                raise ValueError("Cursor was issued for another ordering")
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        field = self.orderings[self.ordering][0]
+        if value is not None and field == "created_at":
+            value = parse_datetime(value)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+        return value, last_id
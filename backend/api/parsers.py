@@ -0,0 +1,36 @@
+"""
+JSON parser backed by orjson when it is installed.
+
+orjson reads the UTF-8 body in one pass and, like DRF's strict mode,
+rejects ``NaN`` and ``Infinity``. Other encodings and non-strict settings
+use the stock parser.
+"""
+
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        if (
+            orjson is None
+            or not self.strict
+            or codecs.lookup(encoding).name != "utf-8"
+        ):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
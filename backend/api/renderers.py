@@ -0,0 +1,68 @@
+"""
+JSON renderer backed by orjson when it is installed.
+
+Output matches DRF's ``JSONRenderer`` with the default settings (compact,
+UTF-8, strict): dates, times, decimals and everything else orjson does not
+encode the same way are passed to DRF's encoder, and ``\\u2028``/``\\u2029``
+are escaped. Indented output, non-default settings and anything orjson
+rejects (e.g. integers over 64 bits) go through the stock renderer.
+"""
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .metrics import format_prometheus
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    if orjson is not None:
+        options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if LINE_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b"\\u2028")
+        if PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(PARAGRAPH_SEPARATOR, b"\\u2029")
+        return ret
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Renders ``RequestMetrics.as_dict()`` in the Prometheus text format."""
+
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None and response.exception:
+            return f"{data.get('detail', data)}\n".encode()
+        return format_prometheus(data).encode()
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from core.models import CustomUser, Resource, Tag
+from core.models import CustomUser, Job, Resource, Tag
 from django.contrib.auth import get_user_model, authenticate
 
 User = get_user_model()
@@ -51,10 +51,104 @@ class ResourceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Resource
-        fields = ["id", "tags", "external_id", "author", "name", "url", "created_at", "avg_rating"]
+        fields = [
+            "id",
+            "tags",
+            "external_id",
+            "author",
+            "name",
+            "url",
+            "created_at",
+            "avg_rating",
+            "ratings_count",
+        ]
+
+
+class ResourceRowSerializer:
+    """
+    Read-only fast path with the same output as ``ResourceSerializer``.
+
+    Takes ``Resource.objects.values(*ResourceRowSerializer.values)`` rows
+    (in any order) and builds the dicts directly, loading the tag names of
+    the whole page with one query. Tags are listed in tag id order.
+    """
+
+    values = (
+        "id",
+        "external_id",
+        "author",
+        "name",
+        "url",
+        "created_at",
+        "rating_avg",
+        "rating_count",
+    )
+
+    created_at = serializers.DateTimeField()
+
+    def __init__(self, instance=None, many=True, **kwargs):
+        self.instance = instance
+
+    @staticmethod
+    def tag_rows(rows):
+        """(resource id, tag name) for every tag of ``rows``, in tag id order."""
+        return (
+            Resource.tags.through.objects.filter(
+                resource_id__in=[row["id"] for row in rows]
+            )
+            .order_by("tag_id")
+            .values_list("resource_id", "tag__tag")
+        )
+
+    def build(self, rows, tag_rows):
+        tag_names = {}
+        for resource_id, name in tag_rows:
+            tag_names.setdefault(resource_id, []).append(name)
+
+        to_datetime = self.created_at.to_representation
+        return [
+            {
+                "id": row["id"],
+                "tags": tag_names.get(row["id"], []),
+                "external_id": row["external_id"],
+                "author": row["author"],
+                "name": row["name"],
+                "url": row["url"],
+                "created_at": to_datetime(row["created_at"]),
+                "avg_rating": row["rating_avg"] if row["rating_count"] else 0,
+                "ratings_count": row["rating_count"],
+            }
+            for row in rows
+        ]
+
+    @property
+    def data(self):
+        rows = list(self.instance)
+        return self.build(rows, self.tag_rows(rows))
+
 
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = "__all__"
+        fields = ["id", "external_id", "tag"]
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "progress",
+            "total",
+            "result",
+            "error",
+            "attempts",
+            "created_at",
+            "started_at",
+            "heartbeat_at",
+            "finished_at",
+        ]
@@ -9,6 +9,8 @@ from .views import (
     LogoutAPIView,
     CheckAuthAPIView,
     ResourcesListAPIView,
+    ResourceSearchAPIView,
+    LeaderboardAPIView,
     TagListAPIView,
     upload_data,
     SyncPageView,
@@ -16,8 +18,12 @@ from .views import (
     SavedResourcesAPIView,
     GoogleAuthAPIView,
     CustomRefreshTokenView,
-    RateResourceAPIView
+    RateResourceAPIView,
+    ResourceBatchAPIView,
+    MetricsAPIView,
+    JobStatusAPIView,
 )
+from . import async_views
 from django.contrib.staticfiles.views import serve
 
 
@@ -31,11 +37,22 @@ urlpatterns = [
     path("auth/check-auth/", CheckAuthAPIView.as_view(), name="check-auth"),
     path("auth/google/", GoogleAuthAPIView.as_view(), name="google-auth"),
     path("resources/", ResourcesListAPIView.as_view(), name="resources"),
+    path("resources/search/", ResourceSearchAPIView.as_view(), name="search-resources"),
+    path("resources/top/", LeaderboardAPIView.as_view(), name="top-resources"),
     path("resource/save/<int:id>/", SaveOrUnsaveResourceAPIView.as_view(), name="save-resource"),
     path("resource/unsave/<int:id>/", SaveOrUnsaveResourceAPIView.as_view(), name="unsave-resource"),
     path("resources/saved/", SavedResourcesAPIView.as_view(), name="saved-resource"),
     path("resources/rate/<int:resource_id>/", RateResourceAPIView.as_view(), name="rate-resource"),
+    path("resources/batch/", ResourceBatchAPIView.as_view(), name="batch-resources"),
     path("tags/", TagListAPIView.as_view(), name="tags"),
     path("upload-data/", upload_data),
+    path("jobs/<int:pk>/", JobStatusAPIView.as_view(), name="job-status"),
     path("sync-page/", SyncPageView.as_view(), name="sync-page"),
+    path("metrics/", MetricsAPIView.as_view(), name="metrics"),
+    # Async variants for ASGI deployments, see api.async_views.
+    path("async/resources/", async_views.resource_list, name="async-resources"),
+    path("async/tags/", async_views.tag_list, name="async-tags"),
+    path("async/auth/login/", async_views.login, name="async-login"),
+    path("async/auth/check-auth/", async_views.check_auth, name="async-check-auth"),
+    path("async/auth/google/", async_views.google_auth, name="async-google-auth"),
 ]
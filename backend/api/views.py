@@ -1,22 +1,52 @@
 from .serializers import (
     RegisterSerializer,
     LoginSerializer,
-    ResourceSerializer,
+    ResourceRowSerializer,
     TagSerializer,
+    JobSerializer,
 )
+from .caching import CatalogCacheMixin, ConditionalGetMixin, UserStateMixin
+from .metrics import request_metrics
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer, PrometheusRenderer
 from rest_framework.views import APIView
 from rest_framework.viewsets import generics
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken, TokenError
-from core.models import Resource, Tag, UserSavedResource, UserRating
+from rest_framework_simplejwt.tokens import TokenError
+from core.tokens import RefreshToken, AccessToken
+from core.models import (
+    Job,
+    LeaderboardEntry,
+    Resource,
+    Tag,
+    UserSavedResource,
+    UserRating,
+)
+from core import leaderboards, rating_buffer
+from core.batch import apply_operations
+from core.google_auth import verify_google_id_token
+from core.jobs import enqueue, run_now
+from core.search import search
+from core.tag_index import tag_index
+from core.catalog import CATALOG, saved_resources
 import os
 from rest_framework.decorators import api_view
 from django.views.generic import TemplateView
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.db import transaction
+from django.db.models import F
+from rest_framework.permissions import (
+    IsAuthenticated,
+    AllowAny,
+    BasePermission,
+    IsAdminUser,
+)
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -25,6 +55,9 @@ EXTERNAL_API = os.getenv("EXTERNAL_API")
 EXTERNAL_API_RESOURCES = EXTERNAL_API + "resources/"
 EXTERNAL_API_TAGS = EXTERNAL_API + "tags/"
 
+MAX_INGEST_BATCH_SIZE = 10000
+MAX_BATCH_OPERATIONS = 1000
+
 User = get_user_model()
 
 
@@ -46,7 +79,7 @@ class CustomRefreshTokenView(TokenRefreshView):
             refresh = RefreshToken(refresh_token)
 
             user_id = refresh["user_id"]
-            user = User.objects.get(id=user_id)
+            user = User.objects.get(id=user_id, is_active=True)
 
             new_refresh = RefreshToken.for_user(user)
             new_access = new_refresh.access_token
@@ -93,37 +126,180 @@ def upload_data(request):
     tags_data = request.data.get("tags", [])
     resources_data = request.data.get("resources", [])
 
-    for tag in tags_data:
-        Tag.objects.update_or_create(
-            external_id=tag["id"], defaults={"tag": tag["tag"]}
+    try:
+        batch_size = int(request.query_params.get("batch_size", 0)) or None
+    except ValueError:
+        return Response(
+            {"message": "batch_size must be an integer"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-
-    for resource in resources_data:
-        resource_obj, _ = Resource.objects.update_or_create(
-            external_id=resource["id"],
-            defaults={
-                "author": resource["author"],
-                "name": resource["name"],
-                "url": resource["url"],
-                "created_at": resource.get("createdAt"),
-            },
+    if batch_size is not None and not 1 <= batch_size <= MAX_INGEST_BATCH_SIZE:
+        return Response(
+            {"message": f"batch_size must be between 1 and {MAX_INGEST_BATCH_SIZE}"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-        tag_ids = resource.get("appliedTags", [])
-        tags = Tag.objects.filter(external_id__in=tag_ids)
-        resource_obj.tags.set(tags)
+    mark_stale = request.query_params.get("mark_stale", "").lower() in ("true", "1", "yes")
+    wait = request.query_params.get("wait", "").lower() in ("true", "1", "yes")
+
+    job = enqueue(
+        "sync_catalog",
+        {
+            "tags": tags_data,
+            "resources": resources_data,
+            "batch_size": batch_size,
+            "mark_stale": mark_stale,
+        },
+        total=len(resources_data),
+    )
+
+    if wait:
+        run_now(job)
+        if job.status != Job.SUCCEEDED:
+            return Response(
+                {"status": "error", "job_id": job.pk, "message": job.error},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return Response({"status": "success", "job_id": job.pk, **job.result})
+
+    return Response(
+        {
+            "job_id": job.pk,
+            "status": job.status,
+            "status_url": request.build_absolute_uri(
+                reverse("job-status", args=[job.pk])
+            ),
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
 
-    return Response({"status": "success"})
+class JobStatusAPIView(generics.RetrieveAPIView):
+    """Progress of a background job, for clients polling after an upload."""
 
+    permission_classes = [AllowAny]
+    serializer_class = JobSerializer
+    queryset = Job.objects.defer("payload", "cursor")
+    query_budget = 1
+
+
+class ResourceIdPageMixin:
+    """
+    For views whose ``get_queryset`` returns an ordered sequence of resource
+    ids: only the rows of the resources on the requested page are loaded.
+    """
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page or not isinstance(page[0], int):
+            return page
+
+        rows = {
+            row["id"]: row
+            for row in Resource.objects.filter(pk__in=page).values(
+                *ResourceRowSerializer.values
+            )
+        }
+        return [rows[pk] for pk in page if pk in rows]
+
+
+class ResourcesListAPIView(
+    UserStateMixin,
+    ResourceIdPageMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    generics.ListAPIView,
+):
+    serializer_class = ResourceRowSerializer
+    queryset = Resource.objects.order_by("id").values(*ResourceRowSerializer.values)
+    cache_prefix = "resources"
+    # count, page, tags, the user and the two include_user_state queries
+    query_budget = 8
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and KeysetPagination.is_requested(
+            self.request
+        ):
+            self._paginator = KeysetPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        names = [
+            name.strip()
+            for name in self.request.query_params.get("tags", "").split(",")
+            if name.strip()
+        ]
+        if not names:
+            return queryset
+
+        match_all = self.request.query_params.get("tag_match", "all") != "any"
+        # Sorted by id, the same order as the unfiltered list. Both paginators
+        # cut the page from the list, so only its ids reach the database.
+        return tag_index.filter(names, match_all=match_all)
+
+
+class ResourceSearchAPIView(
+    UserStateMixin,
+    ResourceIdPageMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    generics.ListAPIView,
+):
+    serializer_class = ResourceRowSerializer
+    cache_prefix = "search"
+    query_budget = 8
+
+    def get_queryset(self):
+        return search(self.request.query_params.get("q", ""))
+
+
+class LeaderboardAPIView(
+    UserStateMixin,
+    ResourceIdPageMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    generics.ListAPIView,
+):
+    """
+    Resources ranked by their Bayesian-weighted rating, read from the
+    precomputed leaderboards (see ``core.leaderboards``). ``?board=trending``
+    ranks by recent ratings only; ``?tag=<tag id>`` ranks one tag.
+    """
+
+    serializer_class = ResourceRowSerializer
+    cache_prefix = "top"
+    query_budget = 8
+
+    def get_board(self):
+        tag = self.request.query_params.get("tag")
+        if tag is not None:
+            try:
+                return leaderboards.tag_board(int(tag))
+            except ValueError:
+                raise ValidationError({"tag": ["Must be a tag id."]})
+
+        board = self.request.query_params.get("board", leaderboards.TOP)
+        if board not in (leaderboards.TOP, leaderboards.TRENDING):
+            raise ValidationError(
+                {"board": [f"Must be {leaderboards.TOP} or {leaderboards.TRENDING}."]}
+            )
+        return board
 
-class ResourcesListAPIView(generics.ListAPIView):
-    serializer_class = ResourceSerializer
-    queryset = Resource.objects.all()
+    def get_queryset(self):
+        return (
+            LeaderboardEntry.objects.filter(board=self.get_board())
+            .order_by("-score", "resource_id")
+            .values_list("resource_id", flat=True)
+        )
 
 
-class TagListAPIView(generics.ListAPIView):
+class TagListAPIView(ConditionalGetMixin, CatalogCacheMixin, generics.ListAPIView):
     serializer_class = TagSerializer
-    queryset = Tag.objects.all()
+    queryset = Tag.objects.order_by("id")
+    cache_prefix = "tags"
+    query_budget = 4
 
 
 class RegisterAPIView(APIView):
@@ -244,7 +420,7 @@ class CheckAuthAPIView(APIView):
 
                 user_id = refresh["user_id"]
                 try:
-                    user = User.objects.get(id=user_id)
+                    user = User.objects.get(id=user_id, is_active=True)
                 except User.DoesNotExist:
                     raise TokenError("User not found")
 
@@ -291,22 +467,23 @@ class CheckAuthAPIView(APIView):
 
 class SaveOrUnsaveResourceAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         id = kwargs.get("id")
         url_path = request.path
         resource = get_object_or_404(Resource, id=id)
-        user = request.user
+        user_id = request.user.id
 
         if "unsave" in url_path:
-            UserSavedResource.objects.filter(resource=resource, user=user).delete()
+            UserSavedResource.objects.filter(resource=resource, user_id=user_id).delete()
             return Response(
                 {"message": "Resouce was unsaved succesffully!"},
                 status=status.HTTP_200_OK,
             )
 
         UserSavedResource.objects.get_or_create(
-            resource=resource, user=user, is_saved=True
+            resource=resource, user_id=user_id, is_saved=True
         )
 
         return Response(
@@ -314,40 +491,76 @@ class SaveOrUnsaveResourceAPIView(APIView):
         )
 
 
-class SavedResourcesAPIView(APIView):
+class SavedResourcesAPIView(ConditionalGetMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
+    serializer_class = ResourceRowSerializer
+    query_budget = 5
+    per_user = True
+
+    def get_version_names(self, request):
+        return (CATALOG, saved_resources(request.user.id))
+
+    def get_queryset(self):
+        # One join through UserSavedResource, ordered by when it was saved.
+        return (
+            Resource.objects.filter(
+                usersavedresource__user_id=self.request.user.id,
+                usersavedresource__is_saved=True,
+            )
+            .annotate(saved_id=F("usersavedresource__id"))
+            .order_by("saved_id")
+            .values(*ResourceRowSerializer.values)
+        )
 
-    def get(self, request, *args, **kwargs):
-        saved_resources = UserSavedResource.objects.filter(user=request.user)
-
-        resources = [saved.resource for saved in saved_resources]
-
-        serializer = ResourceSerializer(resources, many=True)
-
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
 
 class RateResourceAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    # Four or five of these rescore the resource's leaderboard entries on
+    # commit.
+    query_budget = 16
 
     def post(self, request, *args, **kwargs):
         resource_id = kwargs.get("resource_id")
         rating = request.data.get("rating")
-        user = request.user
+        user_id = request.user.id
 
         if not rating:
             return Response({"error": "Rating value is required."}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            rating = int(rating)
+        except (TypeError, ValueError):
+            rating = None
+        if rating is None or not 1 <= rating <= 5:
+            return Response(
+                {"error": "Rating must be an integer between 1 and 5."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if settings.RATING_WRITE_BEHIND:
+            if not Resource.objects.filter(id=resource_id).exists():
+                return Response({"error": "Resource not found."}, status=status.HTTP_404_NOT_FOUND)
+            rating_buffer.submit(user_id, {resource_id: rating})
+            return Response(
+                {"message": "Rating was accepted!"}, status=status.HTTP_202_ACCEPTED
+            )
+
         try:
             resource = Resource.objects.get(id=resource_id)
         except Resource.DoesNotExist:
             return Response({"error": "Resource not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        rating_obj, created = UserRating.objects.update_or_create(
-            user=user,
-            resource=resource,
-            defaults={'rating': rating}
-        )
+        # The row lock keeps the rating the aggregate delta is computed
+        # from in step with concurrent updates by the same user.
+        with transaction.atomic():
+            rating_obj, created = UserRating.objects.select_for_update().get_or_create(
+                user_id=user_id,
+                resource=resource,
+                defaults={'rating': rating}
+            )
+            if not created:
+                rating_obj.rating = rating
+                rating_obj.save(update_fields=["rating"])
 
         if created:
             message = "Rating was successfully created!"
@@ -357,6 +570,29 @@ class RateResourceAPIView(APIView):
         return Response({"message": message}, status=status.HTTP_200_OK)
 
 
+class ResourceBatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    # Independent of the number of operations, see core.batch; four or five of
+    # these rescore the leaderboard entries on commit.
+    query_budget = 16
+
+    def post(self, request, *args, **kwargs):
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {"error": "operations must be a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return Response(
+                {"error": f"At most {MAX_BATCH_OPERATIONS} operations per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = apply_operations(request.user.id, operations)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 class GoogleAuthAPIView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
@@ -370,9 +606,7 @@ class GoogleAuthAPIView(APIView):
 
         try:
             CLIEND_ID = os.getenv("GOOGLE_CLIENT_ID")
-            idinfo = id_token.verify_oauth2_token(
-                token, google_requests.Request(), CLIEND_ID
-            )
+            idinfo = verify_google_id_token(token, CLIEND_ID)
             email = idinfo["email"]
             name = idinfo.get("name", "")
             picture = idinfo.get("picture")
@@ -415,3 +649,27 @@ class GoogleAuthAPIView(APIView):
             return Response(
                 {"message": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST
             )
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        return bool(token) and constant_time_compare(
+            request.headers.get("X-Metrics-Token", ""), token
+        )
+
+
+class MetricsAPIView(APIView):
+    """
+    Request metrics aggregated by ``api.middleware``: JSON by default, the
+    Prometheus text format for ``Accept: text/plain`` or
+    ``?format=prometheus``.
+    """
+
+    permission_classes = [IsAdminUser | HasMetricsToken]
+    renderer_classes = [FastJSONRenderer, PrometheusRenderer]
+
+    def get(self, request, *args, **kwargs):
+        if not settings.REQUEST_METRICS:
+            raise Http404
+        return Response(request_metrics.as_dict())
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -70,6 +71,20 @@ DATABASES = {
     }
 }
 
+# The default cache also holds the catalog versions that tell every process
+# about writes made by the others; see core.checks. LocMemCache is only
+# right for a single process.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 24 * 60 * 60))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -124,15 +139,70 @@ SESSION_COOKIE_SAMESITE = "None"
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "core.auth_backends.CookieJWTAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "api.renderers.FastJSONRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 500,
 }
 
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+# Build the request user from the token claims instead of loading it.
+JWT_STATELESS_USER = os.getenv("JWT_STATELESS_USER", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+
+# Check refresh tokens against an in-process bloom filter of the blacklist.
+JWT_BLACKLIST_FILTER = os.getenv("JWT_BLACKLIST_FILTER", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+
+# Count queries and time every request (see api.middleware).
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+# Default query budget for views without a ``query_budget``; 0 for none.
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "0"))
+# Raise instead of logging when a request goes over its budget.
+REQUEST_QUERY_BUDGET_STRICT = os.getenv(
+    "REQUEST_QUERY_BUDGET_STRICT", "False"
+).lower() in ("true", "1", "yes")
+# Lets a scraper read /api/metrics/ with an X-Metrics-Token header.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Buffer rating submissions and apply them in bulk with the flush_ratings
+# command (see core.rating_buffer).
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+RATING_FLUSH_BATCH_SIZE = int(os.getenv("RATING_FLUSH_BATCH_SIZE", "1000"))
+
+# Leaderboards (see core.leaderboards): how many ratings at the catalog
+# mean a resource's score starts from, the trending window, and whether
+# rating writes rescore their resource or only refresh_leaderboards does.
+LEADERBOARD_PRIOR_WEIGHT = int(os.getenv("LEADERBOARD_PRIOR_WEIGHT", "10"))
+LEADERBOARD_TRENDING_DAYS = int(os.getenv("LEADERBOARD_TRENDING_DAYS", "7"))
+LEADERBOARD_LIVE_UPDATES = os.getenv("LEADERBOARD_LIVE_UPDATES", "True").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -0,0 +1,232 @@
+"""
+Compare the sync views under WSGI with the async views under ASGI on a
+mix of fast catalog reads and slow Google logins.
+
+    python -m benchmarks.asgi --clients 20 --threads 4 --io-delay 0.2
+
+Google verification is replaced by a stub that sleeps ``--io-delay``
+seconds, standing in for a slow certificate fetch. ``--clients`` clients
+each send ``--requests`` requests one after another, ``--slow-ratio`` of
+them logins. Both servers are run in process and get ``--threads``
+threads: WSGI as request workers (like ``gunicorn --threads``), ASGI as
+the pool that sync-only calls are handed to. ``--io-delay 0`` measures
+the per-request overhead of the async path instead.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from . import harness, seed
+
+
+SERVERS = {
+    "wsgi": {
+        "fast": ("/api/resources/", "/api/tags/"),
+        "slow": "/api/auth/google/",
+    },
+    "asgi": {
+        "fast": ("/api/async/resources/", "/api/async/tags/"),
+        "slow": "/api/async/auth/google/",
+    },
+}
+
+
+def make_plan(args):
+    """Per client, a list of ("fast" | "slow", request) in send order."""
+    rng = random.Random(args.seed)
+    plans = []
+    for _ in range(args.clients):
+        plan = []
+        for _ in range(args.requests):
+            if rng.random() < args.slow_ratio:
+                plan.append(("slow", str(rng.randrange(args.users))))
+            else:
+                plan.append(("fast", rng.randrange(2)))
+        plans.append(plan)
+    return plans
+
+
+def stub_verify(delay):
+    def verify(token, audience, *args, **kwargs):
+        time.sleep(delay)
+        return {"email": seed.user_email(int(token)), "name": f"user{token}"}
+
+    return verify
+
+
+def send(client, server, kind, value):
+    paths = SERVERS[server]
+    if kind == "fast":
+        return client.get(paths["fast"][value])
+    return client.post(
+        paths["slow"], {"token": value}, content_type="application/json"
+    )
+
+
+async def asgi_request(app, method, path, body=b""):
+    """Send one request to the ASGI ``app`` and return the status code."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects; Django cancels this when it is done.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def asend(app, kind, value):
+    paths = SERVERS["asgi"]
+    if kind == "fast":
+        return await asgi_request(app, "GET", paths["fast"][value])
+    return await asgi_request(
+        app, "POST", paths["slow"], json.dumps({"token": value}).encode()
+    )
+
+
+def run_wsgi(plans, threads):
+    from django.db import connections
+    from django.test import Client
+
+    local = threading.local()
+    samples = []
+
+    def handle(kind, value):
+        if not hasattr(local, "client"):
+            local.client = Client()
+        return send(local.client, "wsgi", kind, value)
+
+    def client_loop(plan):
+        for kind, value in plan:
+            started = time.perf_counter()
+            response = workers.submit(handle, kind, value).result()
+            samples.append(
+                (kind, time.perf_counter() - started, response.status_code < 400)
+            )
+
+    with ThreadPoolExecutor(threads) as workers:
+        with ThreadPoolExecutor(len(plans)) as clients:
+            started = time.perf_counter()
+            list(clients.map(client_loop, plans))
+            wall = time.perf_counter() - started
+        # Each worker thread opened its own connection.
+        workers.map(lambda _: connections.close_all(), range(threads))
+    return samples, wall
+
+
+def run_asgi(plans, threads):
+    # Django's test AsyncClient closes responses on the default executor,
+    # where they would queue behind the slow calls, so requests go to the
+    # real handler instead.
+    from django.core.handlers.asgi import ASGIHandler
+
+    app = ASGIHandler()
+    samples = []
+
+    async def client_loop(plan):
+        for kind, value in plan:
+            started = time.perf_counter()
+            status_code = await asend(app, kind, value)
+            samples.append((kind, time.perf_counter() - started, status_code < 400))
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(threads))
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(plan) for plan in plans))
+        return time.perf_counter() - started
+
+    wall = asyncio.run(main())
+    return samples, wall
+
+
+def report(server, samples, wall):
+    def ms(kind, pct):
+        values = [elapsed * 1000 for k, elapsed, ok in samples if k == kind and ok]
+        return harness.percentile(values, pct)
+
+    errors = sum(not ok for _, _, ok in samples)
+    print(
+        f"{server:<6} {ms('fast', 50):>9.1f} {ms('fast', 95):>9.1f} "
+        f"{ms('slow', 50):>9.1f} {ms('slow', 95):>9.1f} "
+        f"{len(samples) / wall:>8.1f} {errors:>7}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--io-delay", type=float, default=0.2)
+    parser.add_argument("--slow-ratio", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--resources", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from django.db import connection
+
+    if connection.vendor == "sqlite":
+        # Threads writing to SQLite's shared in-memory test database fail on
+        # table locks instead of waiting, so use a file.
+        connection.settings_dict["TEST"]["NAME"] = str(
+            Path(tempfile.mkdtemp()) / "benchmark.sqlite3"
+        )
+
+    plans = make_plan(args)
+    verify = stub_verify(args.io_delay)
+    with harness.test_database(), mock.patch(
+        "api.views.verify_google_id_token", verify
+    ), mock.patch("api.async_views.verify_google_id_token", verify):
+        seed.seed(
+            users=args.users,
+            resources=args.resources,
+            ratings=args.resources,
+            saves=0,
+            seed=args.seed,
+        )
+
+        print(
+            f"{'server':<6} {'fast p50':>9} {'fast p95':>9} {'slow p50':>9} "
+            f"{'slow p95':>9} {'rps':>8} {'errors':>7}"
+        )
+        report("wsgi", *run_wsgi(plans, args.threads))
+        report("asgi", *run_asgi(plans, args.threads))
+
+
+if __name__ == "__main__":
+    main()
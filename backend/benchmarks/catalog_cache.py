@@ -0,0 +1,59 @@
+"""
+Benchmark cold vs warm requests to the cached catalog endpoints.
+
+    python -m benchmarks.catalog_cache --resources 5000 --requests 50
+
+Cold requests clear the cache first, warm requests are served from it.
+"""
+
+import argparse
+
+from . import harness
+from .ingest import make_payload
+
+
+ENDPOINTS = ("/api/resources/", "/api/resources/?page=2", "/api/tags/")
+
+
+def measure(client, path, requests, cold):
+    from django.core.cache import cache
+
+    samples = []
+    client.get(path)
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        elapsed, response = harness.timed(client.get, path)
+        assert response.status_code == 200, response.status_code
+        samples.append(elapsed * 1000)
+    return harness.summarize(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from django.test import Client
+
+    from api.caching import cache_stats
+    from core.ingest import ingest_catalog
+
+    with harness.test_database():
+        ingest_catalog(*make_payload(args.resources))
+        client = Client()
+
+        print(f"{'endpoint':<24} {'cache':>5} {'median ms':>10} {'p95 ms':>8}")
+        for path in ENDPOINTS:
+            for label, cold in (("cold", True), ("warm", False)):
+                stats = measure(client, path, args.requests, cold)
+                print(
+                    f"{path:<24} {label:>5} {stats['median']:>10.2f} {stats['p95']:>8.2f}"
+                )
+        print(f"cache counters: {cache_stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Load-test the API endpoints on a seeded throwaway database.
+
+    python -m benchmarks.endpoints --users 200 --resources 20000 --requests 200
+    python -m benchmarks.endpoints --compare results/3252d0b-sqlite.json
+
+Requests go through Django's test client from ``--concurrency`` threads,
+so the numbers cover the whole middleware/DRF stack without a network hop.
+Every endpoint reports p50/p95/p99 latency, queries per request and
+requests per second; failed requests are counted as errors and left out
+of the latencies. Reads run before writes, because writes bump the catalog
+version the cached endpoints are keyed on. SQLite allows one writer at a
+time, so expect errors on the write endpoints there with ``--concurrency``
+above 1.
+
+The database is the configured one, so the same run works against
+SQLite and against a local PostgreSQL-compatible server:
+
+    DB_ENGINE=django.db.backends.postgresql DB_HOST=localhost DB_NAME=bench \\
+        DB_USER=bench DB_PASSWORD=bench python -m benchmarks.endpoints
+
+Each run is saved as ``results/<commit>-<vendor>.json``. ``--compare BASE
+[HEAD]`` prints the change between two saved runs; without HEAD it runs
+the benchmark and compares the new results against BASE.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import harness, seed
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+WORDS = ("resource", "author", "python", "guide", "tag")
+
+
+def list_resources(context, rng):
+    return "get", f"/api/resources/?page={rng.randint(1, context['pages'])}", None
+
+
+def keyset_resources(context, rng):
+    return "get", rng.choice(context["keyset_urls"]), None
+
+
+def list_tags(context, rng):
+    return "get", "/api/tags/", None
+
+
+def search_resources(context, rng):
+    return "get", f"/api/resources/search/?q={rng.choice(WORDS)}", None
+
+
+def top_resources(context, rng):
+    return "get", f"/api/resources/top/?board={rng.choice(('top', 'trending'))}", None
+
+
+def saved_resources(context, rng):
+    return "get", "/api/resources/saved/", None
+
+
+def login(context, rng):
+    email = seed.user_email(rng.randrange(context["users"]))
+    return "post", "/api/auth/login/", {"email": email, "password": seed.PASSWORD}
+
+
+def rate_resource(context, rng):
+    resource_id = rng.choice(context["resource_ids"])
+    return "post", f"/api/resources/rate/{resource_id}/", {"rating": rng.randint(1, 5)}
+
+
+def upload_data(context, rng):
+    # A re-sync of part of the catalog with a few resources renamed.
+    tags, resources = context["sync_payload"]
+    resources = [
+        {**item, "name": f"{item['name']} ({rng.random():.6f})"}
+        if rng.random() < 0.05
+        else item
+        for item in resources
+    ]
+    # wait=true runs the sync job inside the request, so it is measured.
+    return (
+        "post",
+        "/api/upload-data/?wait=true",
+        {"tags": tags, "resources": resources},
+    )
+
+
+# name, request factory, authenticated, settings overrides
+ENDPOINTS = [
+    ("resources", list_resources, False, {}),
+    ("resources-uncached", list_resources, False, {"CATALOG_CACHE_TIMEOUT": 0}),
+    ("resources-keyset", keyset_resources, False, {"CATALOG_CACHE_TIMEOUT": 0}),
+    ("tags", list_tags, False, {}),
+    ("search", search_resources, False, {"CATALOG_CACHE_TIMEOUT": 0}),
+    ("top-uncached", top_resources, False, {"CATALOG_CACHE_TIMEOUT": 0}),
+    ("saved", saved_resources, True, {}),
+    ("login", login, False, {}),
+    ("rate", rate_resource, True, {}),
+    (
+        "rate-no-leaderboards",
+        rate_resource,
+        True,
+        {"LEADERBOARD_LIVE_UPDATES": False},
+    ),
+    ("rate-write-behind", rate_resource, True, {"RATING_WRITE_BEHIND": True}),
+    ("upload-data", upload_data, False, {}),
+]
+
+
+def keyset_urls(step=1000):
+    """
+    Newest-first keyset pages spread over the whole resource list: the first
+    page and the page after every ``step`` resources, found by following the
+    ``next`` cursors with ``step`` sized pages.
+    """
+    from django.conf import settings
+    from django.test import Client
+    from rest_framework.utils.urls import replace_query_param
+
+    client = Client()
+    page_size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+    url = f"/api/resources/?pagination=cursor&ordering=-created_at&page_size={step}"
+    urls = []
+    while url:
+        urls.append(replace_query_param(url, "page_size", page_size))
+        url = client.get(url).json()["next"]
+    return urls
+
+
+def make_client(context, rng, authenticated):
+    from django.test import Client
+
+    from core.models import CustomUser
+    from core.tokens import AccessToken
+
+    client = Client()
+    if authenticated:
+        user = CustomUser.objects.get(pk=rng.choice(context["user_ids"]))
+        client.cookies["access_token"] = str(AccessToken.for_user(user))
+    return client
+
+
+def send(client, request):
+    method, path, data = request
+    if method == "get":
+        return client.get(path)
+    return client.post(path, data, content_type="application/json")
+
+
+def worker(factory, authenticated, context, requests, seed_value, results):
+    from django.db import connections
+
+    rng = random.Random(seed_value)
+    client = make_client(context, rng, authenticated)
+    try:
+        for _ in range(requests):
+            request = factory(context, rng)
+            with harness.count_queries() as counter:
+                try:
+                    elapsed, response = harness.timed(send, client, request)
+                    ok = response.status_code < 400
+                except Exception:
+                    elapsed, ok = 0, False
+            results.append((elapsed * 1000, counter["queries"], ok))
+    finally:
+        connections.close_all()
+
+
+def run_endpoint(factory, authenticated, context, args, offset):
+    rng = random.Random(offset)
+    client = make_client(context, rng, authenticated)
+    for _ in range(args.warmup):
+        send(client, factory(context, rng))
+
+    results = []
+    per_thread = args.requests // args.concurrency
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(
+                factory,
+                authenticated,
+                context,
+                per_thread + (i < args.requests % args.concurrency),
+                offset + i,
+                results,
+            ),
+        )
+        for i in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    samples = [elapsed for elapsed, _, ok in results if ok]
+    return {
+        "requests": len(results),
+        "errors": sum(not ok for _, _, ok in results),
+        "p50": harness.percentile(samples, 50),
+        "p95": harness.percentile(samples, 95),
+        "p99": harness.percentile(samples, 99),
+        "queries": sum(queries for _, queries, _ in results) / max(len(results), 1),
+        "rps": len(results) / wall if wall else 0.0,
+    }
+
+
+def database_info():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("SELECT sqlite_version()")
+        else:
+            cursor.execute("SELECT version()")
+        version = cursor.fetchone()[0]
+    return {"vendor": connection.vendor, "version": version}
+
+
+def git(*args):
+    return subprocess.run(
+        ["git", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=harness.BACKEND_DIR,
+    ).stdout.strip()
+
+
+def git_commit():
+    """(short commit hash, whether tracked files have local changes)"""
+    try:
+        commit = git("rev-parse", "--short", "HEAD")
+        dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def run(args):
+    import django
+    from django.conf import settings
+    from django.test import override_settings
+
+    from core.models import CustomUser, Resource
+
+    from .ingest import make_payload
+
+    hashers = (
+        ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        if args.fast_hasher
+        else settings.PASSWORD_HASHERS
+    )
+    selected = [item for item in ENDPOINTS if item[0] in args.endpoints]
+
+    with harness.test_database(), override_settings(PASSWORD_HASHERS=hashers):
+        elapsed, counts = harness.timed(
+            seed.seed,
+            users=args.users,
+            tags=args.tags,
+            resources=args.resources,
+            ratings=args.ratings,
+            saves=args.saves,
+            seed=args.seed,
+        )
+        print(f"seeded {counts} in {elapsed:.1f}s")
+
+        tags, resources = make_payload(args.resources, tags=args.tags, seed=args.seed)
+        page_size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+        context = {
+            "users": args.users,
+            "user_ids": list(CustomUser.objects.values_list("pk", flat=True)),
+            "resource_ids": list(Resource.objects.values_list("pk", flat=True)),
+            "pages": max(1, -(-args.resources // page_size)),
+            "sync_payload": (tags, resources[: args.sync_resources]),
+            "keyset_urls": keyset_urls(),
+        }
+
+        print(
+            f"\n{'endpoint':<20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'rps':>8} {'errors':>7}"
+        )
+        endpoints = {}
+        for offset, (name, factory, authenticated, overrides) in enumerate(selected):
+            with override_settings(**overrides):
+                stats = run_endpoint(
+                    factory, authenticated, context, args, args.seed + offset * 1000
+                )
+            endpoints[name] = stats
+            print(
+                f"{name:<20} {stats['p50']:>8.2f} {stats['p95']:>8.2f} "
+                f"{stats['p99']:>8.2f} {stats['queries']:>8.1f} "
+                f"{stats['rps']:>8.1f} {stats['errors']:>7}"
+            )
+
+        database = database_info()
+
+    commit, dirty = git_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "database": database,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "config": {
+            name: getattr(args, name)
+            for name in (
+                "users",
+                "tags",
+                "resources",
+                "ratings",
+                "saves",
+                "sync_resources",
+                "requests",
+                "concurrency",
+                "fast_hasher",
+                "seed",
+            )
+        },
+        "endpoints": endpoints,
+    }
+
+
+def save(results, output_dir):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    name = results["commit"] + ("-dirty" if results["dirty"] else "")
+    path = output_dir / f"{name}-{results['database']['vendor']}.json"
+    path.write_text(json.dumps(results, indent=2) + "\n")
+    return path
+
+
+def compare(base, head):
+    print(
+        f"\nbase {base['commit']} ({base['database']['vendor']}), "
+        f"head {head['commit']} ({head['database']['vendor']})"
+    )
+    if base["config"] != head["config"]:
+        print("warning: the runs used different settings")
+
+    print(f"{'endpoint':<20} {'metric':<8} {'base':>9} {'head':>9} {'change':>8}")
+    for name, after in head["endpoints"].items():
+        before = base["endpoints"].get(name)
+        if before is None:
+            continue
+        for metric in ("p50", "p95", "p99", "queries", "rps"):
+            change = (
+                f"{(after[metric] - before[metric]) / before[metric] * 100:+.1f}%"
+                if before[metric]
+                else ""
+            )
+            print(
+                f"{name:<20} {metric:<8} {before[metric]:>9.2f} "
+                f"{after[metric]:>9.2f} {change:>8}"
+            )
+
+
+def load(path):
+    return json.loads(Path(path).read_text())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--resources", type=int, default=5000)
+    parser.add_argument("--ratings", type=int, default=20000)
+    parser.add_argument("--saves", type=int, default=5000)
+    parser.add_argument(
+        "--sync-resources",
+        type=int,
+        default=1000,
+        help="resources in each upload-data request",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        choices=[name for name, *_ in ENDPOINTS],
+        default=[name for name, *_ in ENDPOINTS],
+    )
+    parser.add_argument(
+        "--fast-hasher",
+        action="store_true",
+        help="hash passwords with MD5 so login measures everything but hashing",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS", default=None)
+    args = parser.parse_args(argv)
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes BASE and optionally HEAD")
+    if args.compare and len(args.compare) == 2:
+        compare(load(args.compare[0]), load(args.compare[1]))
+        return
+
+    harness.setup()
+    results = run(args)
+    print(f"\nsaved {save(results, args.output)}")
+    if args.compare:
+        compare(load(args.compare[0]), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks are run from the ``backend`` directory, e.g.
+``python -m benchmarks.ingest``, and always work on a throwaway test
+database created from the configured ``DATABASES`` setting.
+"""
+
+import contextlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup():
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+    import django
+
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        cache.clear()
+        teardown_test_environment()
+
+
+@contextlib.contextmanager
+def count_queries():
+    from django.db import connection
+
+    counter = {"queries": 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter["queries"] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "p95": percentile(samples, 95),
+        "max": max(samples),
+    }
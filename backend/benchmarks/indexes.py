@@ -0,0 +1,216 @@
+"""
+Report query plans and timings for the hot query paths before and after
+the indexes of migration 0012.
+
+    python -m benchmarks.indexes --resources 100000 --users 2000
+
+The synthetic dataset is seeded with migration 0012 unapplied. Each query
+is explained and timed, the migration is applied, and everything is
+measured again on the same data.
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from . import harness
+
+
+BEFORE = "0011_resource_search_document"
+AFTER = "0012_hot_path_indexes"
+
+
+def seed(resources, users, saves_per_user, ratings_per_user, seed=0):
+    from core.models import CustomUser, Resource, UserRating, UserSavedResource
+
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    Resource.objects.bulk_create(
+        (
+            Resource(
+                external_id=f"res-{i}",
+                author=f"Author {i % 500}",
+                name=f"Resource {i}",
+                url=f"https://example.com/{i}",
+                created_at=(
+                    None
+                    if rng.random() < 0.1
+                    else start + timedelta(minutes=rng.randrange(2_000_000))
+                ),
+                rating_sum=(total := rng.randrange(0, 50)),
+                rating_count=(count := rng.randrange(1, 11)),
+                rating_avg=total / count,
+            )
+            for i in range(resources)
+        ),
+        batch_size=5000,
+    )
+    CustomUser.objects.bulk_create(
+        (
+            CustomUser(email=f"user{i}@example.com", username=f"user{i}")
+            for i in range(users)
+        ),
+        batch_size=5000,
+    )
+
+    resource_ids = list(Resource.objects.values_list("pk", flat=True))
+    user_ids = list(CustomUser.objects.values_list("pk", flat=True))
+    saved = []
+    ratings = []
+    for user_id in user_ids:
+        for resource_id in rng.sample(resource_ids, saves_per_user):
+            saved.append(
+                UserSavedResource(
+                    user_id=user_id,
+                    resource_id=resource_id,
+                    is_saved=rng.random() < 0.8,
+                )
+            )
+        for resource_id in rng.sample(resource_ids, ratings_per_user):
+            ratings.append(
+                UserRating(
+                    user_id=user_id,
+                    resource_id=resource_id,
+                    rating=rng.randrange(1, 6),
+                )
+            )
+    UserSavedResource.objects.bulk_create(saved, batch_size=5000)
+    UserRating.objects.bulk_create(ratings, batch_size=5000)
+    return resource_ids, user_ids
+
+
+def hot_queries(resource_ids, user_ids, page_size):
+    """(label, queryset) for the queries behind each endpoint."""
+    from django.db.models import Count, F, Sum
+
+    from api.pagination import KeysetPagination
+    from core.models import Resource, UserRating, UserSavedResource
+
+    paginator = KeysetPagination()
+    user_id = user_ids[len(user_ids) // 2]
+    resource_id = resource_ids[len(resource_ids) // 2]
+    page_ids = resource_ids[:page_size]
+
+    return [
+        (
+            "resources/?ordering=-created_at",
+            Resource.objects.order_by(
+                *paginator.get_order_by("created_at", True, True)
+            )[:page_size],
+        ),
+        (
+            "resources/?ordering=created_at",
+            Resource.objects.order_by(
+                *paginator.get_order_by("created_at", False, True)
+            )[:page_size],
+        ),
+        (
+            "resources/?ordering=-rating",
+            Resource.objects.order_by(
+                *paginator.get_order_by("rating_avg", True, False)
+            )[:page_size],
+        ),
+        (
+            "resources/saved/",
+            Resource.objects.filter(
+                usersavedresource__user_id=user_id,
+                usersavedresource__is_saved=True,
+            )
+            .annotate(saved_id=F("usersavedresource__id"))
+            .order_by("saved_id")[:page_size],
+        ),
+        (
+            "rating aggregate (one resource)",
+            UserRating.objects.filter(resource_id=resource_id)
+            .values("resource")
+            .annotate(total=Sum("rating"), count=Count("pk")),
+        ),
+        (
+            "include_user_state: saved",
+            UserSavedResource.objects.filter(
+                user_id=user_id, is_saved=True, resource_id__in=page_ids
+            ).values_list("resource_id", flat=True),
+        ),
+        (
+            "include_user_state: ratings",
+            UserRating.objects.filter(
+                user_id=user_id, resource_id__in=page_ids
+            ).values_list("resource_id", "rating"),
+        ),
+    ]
+
+
+def measure(queries, repeat):
+    results = {}
+    for label, queryset in queries:
+        samples = []
+        for _ in range(repeat):
+            elapsed, _ = harness.timed(list, queryset.all())
+            samples.append(elapsed * 1000)
+        results[label] = (harness.summarize(samples), queryset.explain())
+    return results
+
+
+def analyze():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            for table in ("core_resource", "core_userrating", "core_usersavedresource"):
+                cursor.execute(f"ANALYZE TABLE {table}")
+        else:
+            cursor.execute("ANALYZE")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--saves-per-user", type=int, default=50)
+    parser.add_argument("--ratings-per-user", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--plans", action="store_true", help="print full plans")
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from django.core.management import call_command
+
+    with harness.test_database():
+        call_command("migrate", "core", BEFORE, verbosity=0)
+        elapsed, (resource_ids, user_ids) = harness.timed(
+            seed,
+            args.resources,
+            args.users,
+            args.saves_per_user,
+            args.ratings_per_user,
+        )
+        print(f"seeded in {elapsed:.1f}s")
+        queries = hot_queries(resource_ids, user_ids, args.page_size)
+
+        analyze()
+        before = measure(queries, args.repeat)
+        elapsed, _ = harness.timed(call_command, "migrate", "core", AFTER, verbosity=0)
+        print(f"migration 0012 applied in {elapsed:.1f}s")
+        analyze()
+        after = measure(queries, args.repeat)
+
+        print(f"\n{'query':<34} {'before ms':>10} {'after ms':>10}")
+        for label, _ in queries:
+            print(
+                f"{label:<34} {before[label][0]['median']:>10.2f} "
+                f"{after[label][0]['median']:>10.2f}"
+            )
+
+        for label, _ in queries:
+            print(f"\n== {label}")
+            for name, results in (("before", before), ("after", after)):
+                plan = results[label][1].splitlines()
+                if not args.plans:
+                    plan = [line for line in plan if line.strip()][:4]
+                print(f"-- {name}")
+                print("\n".join(f"   {line}" for line in plan))
+
+
+if __name__ == "__main__":
+    main()
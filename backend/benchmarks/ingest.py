@@ -0,0 +1,99 @@
+"""
+Benchmark the bulk catalog ingest against the per-row loop it replaced.
+
+    python -m benchmarks.ingest --sizes 1000 10000 100000
+
+Every scenario runs on a fresh test database: an initial load into an
+empty catalog, then a re-sync of the identical payload.
+"""
+
+import argparse
+import random
+
+from . import harness
+
+
+def make_payload(resources, tags=50, seed=0):
+    rng = random.Random(seed)
+    tags_data = [{"id": f"tag-{i}", "tag": f"Tag {i}"} for i in range(tags)]
+    resources_data = [
+        {
+            "id": f"res-{i}",
+            "author": f"Author {rng.randrange(resources // 10 + 1)}",
+            "name": f"Resource {i}",
+            "url": f"https://example.com/resources/{i}",
+            "createdAt": f"2024-01-{rng.randrange(1, 29):02d}T12:00:00.000Z",
+            "appliedTags": [
+                tag["id"] for tag in rng.sample(tags_data, rng.randrange(1, 5))
+            ],
+        }
+        for i in range(resources)
+    ]
+    return tags_data, resources_data
+
+
+def legacy_ingest(tags_data, resources_data):
+    """The original ``upload_data`` loop, kept here as the baseline."""
+    from core.models import Resource, Tag
+
+    for tag in tags_data:
+        Tag.objects.update_or_create(
+            external_id=tag["id"], defaults={"tag": tag["tag"]}
+        )
+
+    for resource in resources_data:
+        resource_obj, _ = Resource.objects.update_or_create(
+            external_id=resource["id"],
+            defaults={
+                "author": resource["author"],
+                "name": resource["name"],
+                "url": resource["url"],
+                "created_at": resource.get("createdAt"),
+            },
+        )
+
+        tag_ids = resource.get("appliedTags", [])
+        tags = Tag.objects.filter(external_id__in=tag_ids)
+        resource_obj.tags.set(tags)
+
+
+def run_scenario(label, ingest, payload):
+    with harness.test_database():
+        rows = []
+        for phase in ("initial", "re-sync"):
+            with harness.count_queries() as counter:
+                elapsed, _ = harness.timed(ingest, *payload)
+            rows.append((label, phase, elapsed, counter["queries"]))
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=None,
+        help="skip the legacy loop for catalogs larger than this",
+    )
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from core.ingest import ingest_catalog
+
+    def bulk(tags_data, resources_data):
+        return ingest_catalog(tags_data, resources_data, batch_size=args.batch_size)
+
+    print(f"{'resources':>10} {'engine':>7} {'phase':>8} {'seconds':>9} {'queries':>8}")
+    for size in args.sizes:
+        payload = make_payload(size)
+        rows = run_scenario("bulk", bulk, payload)
+        if args.legacy_limit is None or size <= args.legacy_limit:
+            rows += run_scenario("legacy", legacy_ingest, payload)
+        for label, phase, elapsed, queries in rows:
+            print(f"{size:>10} {label:>7} {phase:>8} {elapsed:>9.3f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark the orjson-backed renderer and parser against DRF's stock ones.
+
+    python -m benchmarks.json_codec --page-size 500 --sync-resources 20000
+
+Renders a serialized ``ResourceSerializer`` page and parses a sync payload
+of the shape ``upload_data`` receives, checking both pairs agree.
+"""
+
+import argparse
+import io
+import json
+
+from . import harness
+from .ingest import make_payload
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        elapsed, result = harness.timed(func)
+        samples.append(elapsed * 1000)
+    return harness.summarize(samples), result
+
+
+def report(label, size, stock, fast):
+    print(
+        f"{label:<28} {size / 1024:>9.0f} {stock['median']:>10.2f} "
+        f"{fast['median']:>9.2f} {stock['median'] / fast['median']:>7.1f}x"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--sync-resources", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from api import renderers
+    from api.parsers import FastJSONParser
+    from api.renderers import FastJSONRenderer
+    from api.serializers import ResourceSerializer
+    from core.ingest import ingest_catalog
+    from core.models import Resource
+
+    if renderers.orjson is None:
+        print("orjson is not installed; the fast classes fall back to the stock ones")
+
+    with harness.test_database():
+        ingest_catalog(*make_payload(args.page_size))
+        page = ResourceSerializer(
+            Resource.objects.prefetch_related("tags").order_by("id"), many=True
+        ).data
+        data = {"count": len(page), "next": None, "previous": None, "results": page}
+
+        stock, expected = measure(lambda: JSONRenderer().render(data), args.repeat)
+        fast, rendered = measure(lambda: FastJSONRenderer().render(data), args.repeat)
+        assert rendered == expected
+
+        tags, resources = make_payload(args.sync_resources)
+        body = json.dumps({"tags": tags, "resources": resources}).encode()
+        stock_parse, expected = measure(
+            lambda: JSONParser().parse(io.BytesIO(body)), args.repeat
+        )
+        fast_parse, parsed = measure(
+            lambda: FastJSONParser().parse(io.BytesIO(body)), args.repeat
+        )
+        assert parsed == expected
+
+        print(f"{'':<28} {'KiB':>9} {'stock ms':>10} {'fast ms':>9} {'speedup':>8}")
+        report(f"render {args.page_size}-item page", len(rendered), stock, fast)
+        report(
+            f"parse {args.sync_resources}-item sync", len(body), stock_parse, fast_parse
+        )
+
+
+if __name__ == "__main__":
+    main()
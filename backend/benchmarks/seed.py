@@ -0,0 +1,82 @@
+"""
+Synthetic data for the endpoint benchmarks.
+
+The catalog goes through ``ingest_catalog`` like a real sync; users,
+ratings and saves are bulk-inserted and the rating aggregates and
+leaderboards rebuilt afterwards. The same arguments always produce the
+same data.
+"""
+
+import random
+
+
+PASSWORD = "benchmark-password"
+
+
+def user_email(index):
+    return f"user{index}@example.com"
+
+
+def sample_pairs(rng, user_ids, resource_ids, count):
+    """``count`` distinct (user id, resource id) pairs."""
+    count = min(count, len(user_ids) * len(resource_ids))
+    for index in rng.sample(range(len(user_ids) * len(resource_ids)), count):
+        user_index, resource_index = divmod(index, len(resource_ids))
+        yield user_ids[user_index], resource_ids[resource_index]
+
+
+def seed(users=100, tags=50, resources=5000, ratings=20000, saves=5000, seed=0):
+    from django.contrib.auth.hashers import make_password
+
+    from core import leaderboards
+    from core.catalog import invalidate
+    from core.ingest import ingest_catalog
+    from core.models import CustomUser, Resource, UserRating, UserSavedResource
+
+    from .ingest import make_payload
+
+    rng = random.Random(seed)
+    ingest_catalog(*make_payload(resources, tags=tags, seed=seed))
+
+    # Hashing is slow on purpose; every user shares the one hash.
+    password = make_password(PASSWORD)
+    CustomUser.objects.bulk_create(
+        (
+            CustomUser(email=user_email(i), username=f"user{i}", password=password)
+            for i in range(users)
+        ),
+        batch_size=1000,
+    )
+
+    resource_ids = list(Resource.objects.order_by("pk").values_list("pk", flat=True))
+    user_ids = list(CustomUser.objects.order_by("pk").values_list("pk", flat=True))
+
+    UserRating.objects.bulk_create(
+        (
+            UserRating(user_id=user_id, resource_id=resource_id, rating=rng.randint(1, 5))
+            for user_id, resource_id in sample_pairs(
+                rng, user_ids, resource_ids, ratings
+            )
+        ),
+        batch_size=1000,
+    )
+    UserSavedResource.objects.bulk_create(
+        (
+            UserSavedResource(user_id=user_id, resource_id=resource_id, is_saved=True)
+            for user_id, resource_id in sample_pairs(rng, user_ids, resource_ids, saves)
+        ),
+        batch_size=1000,
+    )
+
+    # bulk_create skips the signals that keep these up to date.
+    Resource.objects.rebuild_rating_stats()
+    invalidate()
+    leaderboards.refresh()
+
+    return {
+        "users": len(user_ids),
+        "tags": tags,
+        "resources": len(resource_ids),
+        "ratings": UserRating.objects.count(),
+        "saves": UserSavedResource.objects.count(),
+    }
@@ -0,0 +1,87 @@
+"""
+Benchmark ResourceRowSerializer against ResourceSerializer on one page.
+
+    python -m benchmarks.serializers --page-size 500
+
+"serialize" starts from loaded data: prefetched instances for
+ResourceSerializer, ``.values()`` rows for the row serializer (which still
+runs its tag query). "page" also includes loading that data. Both outputs
+are checked to render to the same bytes.
+"""
+
+import argparse
+
+from . import harness
+from .ingest import make_payload
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        elapsed, result = harness.timed(func)
+        samples.append(elapsed * 1000)
+    return harness.summarize(samples), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from django.db.models import Prefetch
+    from rest_framework.renderers import JSONRenderer
+
+    from api.serializers import ResourceRowSerializer, ResourceSerializer
+    from core.ingest import ingest_catalog
+    from core.models import Resource, Tag
+
+    with harness.test_database():
+        ingest_catalog(*make_payload(args.page_size))
+
+        def instances():
+            return list(
+                Resource.objects.prefetch_related(
+                    Prefetch("tags", queryset=Tag.objects.order_by("id"))
+                ).order_by("id")[: args.page_size]
+            )
+
+        def rows():
+            return list(
+                Resource.objects.order_by("id").values(*ResourceRowSerializer.values)[
+                    : args.page_size
+                ]
+            )
+
+        loaded_instances = instances()
+        loaded_rows = rows()
+        stock, expected = measure(
+            lambda: ResourceSerializer(loaded_instances, many=True).data, args.repeat
+        )
+        fast, data = measure(
+            lambda: ResourceRowSerializer(loaded_rows).data, args.repeat
+        )
+        assert JSONRenderer().render(data) == JSONRenderer().render(expected)
+
+        stock_page, _ = measure(
+            lambda: ResourceSerializer(instances(), many=True).data, args.repeat
+        )
+        fast_page, _ = measure(lambda: ResourceRowSerializer(rows()).data, args.repeat)
+
+        print(
+            f"{'':<12} {'ResourceSerializer ms':>22} "
+            f"{'row serializer ms':>18} {'speedup':>8}"
+        )
+        for label, before, after in (
+            ("serialize", stock, fast),
+            ("page", stock_page, fast_page),
+        ):
+            print(
+                f"{label:<12} {before['median']:>22.2f} {after['median']:>18.2f} "
+                f"{before['median'] / after['median']:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark tag filtering through the in-process tag index vs ORM joins.
+
+    python -m benchmarks.tag_filter --resources 50000 --requests 50
+
+The ORM baseline joins the through table once per tag for "all" filters
+and uses ``tags__tag__in`` with ``DISTINCT`` for "any" filters. Both sides
+return the full sorted id list so the results can be compared.
+"""
+
+import argparse
+
+from . import harness
+from .ingest import make_payload
+
+
+FILTERS = (
+    (["Tag 0"], True),
+    (["Tag 0", "Tag 1"], True),
+    (["Tag 0", "Tag 1", "Tag 2"], True),
+    (["Tag 0", "Tag 1", "Tag 2"], False),
+    ([f"Tag {i}" for i in range(10)], False),
+)
+
+
+def orm_filter(names, match_all):
+    from core.models import Resource
+
+    queryset = Resource.objects.all()
+    if match_all:
+        for name in names:
+            queryset = queryset.filter(tags__tag=name)
+    else:
+        queryset = queryset.filter(tags__tag__in=names).distinct()
+    return list(queryset.order_by("id").values_list("id", flat=True))
+
+
+def measure(func, names, match_all, requests):
+    samples = []
+    for _ in range(requests):
+        elapsed, ids = harness.timed(func, names, match_all)
+        samples.append(elapsed * 1000)
+    return harness.summarize(samples), list(ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=50000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    harness.setup()
+    from core.ingest import ingest_catalog
+    from core.tag_index import tag_index
+
+    with harness.test_database():
+        ingest_catalog(*make_payload(args.resources, tags=args.tags))
+
+        elapsed, _ = harness.timed(tag_index.ensure_current)
+        print(f"index build: {elapsed * 1000:.1f}ms for {args.resources} resources")
+
+        print(
+            f"{'filter':<34} {'matches':>8} {'orm ms':>8} {'index ms':>9} {'speedup':>8}"
+        )
+        for names, match_all in FILTERS:
+            orm, expected = measure(orm_filter, names, match_all, args.requests)
+            index, ids = measure(tag_index.filter, names, match_all, args.requests)
+            assert ids == expected, names
+
+            label = f"{'all' if match_all else 'any'}: {', '.join(names)}"
+            if len(label) > 34:
+                label = label[:31] + "..."
+            print(
+                f"{label:<34} {len(ids):>8} {orm['median']:>8.2f} "
+                f"{index['median']:>9.3f} {orm['median'] / index['median']:>7.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
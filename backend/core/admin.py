@@ -1,9 +1,21 @@
 from django.contrib import admin
-from .models import CustomUser, Resource, Tag, UserRating, UserSavedResource
+from .models import (
+    CustomUser,
+    Job,
+    LeaderboardEntry,
+    PendingRating,
+    Resource,
+    Tag,
+    UserRating,
+    UserSavedResource,
+)
 
 
 admin.site.register(CustomUser)
 admin.site.register(Resource)
 admin.site.register(Tag)
 admin.site.register(UserRating)
+admin.site.register(PendingRating)
 admin.site.register(UserSavedResource)
+admin.site.register(Job)
+admin.site.register(LeaderboardEntry)
@@ -1,13 +1,95 @@
+"""
+JWT authentication from the ``access_token`` cookie or the Authorization
+header.
+
+With ``JWT_STATELESS_USER`` enabled the request user is a ``ClaimsUser``
+built from the signed token claims (see ``core.tokens``), so authenticated
+requests no longer look the user up. Views that need the model instance
+use ``request.user.get_user()``, which is served from a small TTL cache.
+Deactivating or deleting a user sets a marker in the shared cache that
+rejects their outstanding tokens until those expire; ``core.checks``
+refuses the setting without a cache shared between processes.
+"""
+
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+
+_users = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_users_lock = threading.Lock()
+
+
+def inactive_user_key(user_id):
+    return f"user:{user_id}:inactive"
+
+
+def mark_user_inactive(user_id):
+    timeout = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    cache.set(inactive_user_key(user_id), True, timeout)
+    evict_user(user_id)
+
+
+def mark_user_active(user_id):
+    cache.delete(inactive_user_key(user_id))
+    evict_user(user_id)
+
+
+def is_user_inactive(user_id):
+    return cache.get(inactive_user_key(user_id), False)
+
+
+def evict_user(user_id):
+    with _users_lock:
+        _users.pop(user_id, None)
+
+
+def get_cached_user(user_id):
+    with _users_lock:
+        user = _users.get(user_id)
+    if user is None:
+        user = get_user_model().objects.get(pk=user_id)
+        with _users_lock:
+            _users[user_id] = user
+    return user
+
+
+class ClaimsUser(TokenUser):
+    """A request user backed by the validated token's claims."""
+
+    def get_user(self):
+        return get_cached_user(self.id)
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
-        token = request.COOKIES.get('access_token')
-        if not token:
-            return None
+        token = request.COOKIES.get("access_token")
+        if token:
+            try:
+                validated_token = self.get_validated_token(token)
+                return self.get_user(validated_token), validated_token
+            except Exception:
+                pass
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not settings.JWT_STATELESS_USER:
+            return super().get_user(validated_token)
+
         try:
-            validated_token = self.get_validated_token(token)
-            user = self.get_user(validated_token)
-            return user, validated_token
-        except Exception as e:
-            return None
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if is_user_inactive(user_id):
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return ClaimsUser(validated_token)
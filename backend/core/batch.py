@@ -0,0 +1,160 @@
+"""
+Apply a list of save/unsave/rate operations for one user in bulk.
+
+Operations are validated one by one, and every valid operation is then
+applied inside a single transaction with a fixed number of queries:
+save/unsave as one upsert and one delete, ratings as one locked read,
+one ``bulk_create`` and one ``bulk_update``. Later operations on the same
+resource win, as if the operations had been sent one at a time. Bulk
+writes skip the model signals, so the rating aggregates and the cache
+versions are updated here. In write-behind mode ratings go to the
+rating buffer instead.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import rating_buffer
+from .catalog import invalidate, saved_resources
+from .leaderboards import update_on_commit as update_leaderboards
+from .models import Resource, UserRating, UserSavedResource
+from .utils import upsert
+
+
+OPERATIONS = ("save", "unsave", "rate")
+
+
+def _parse(operation):
+    """(op, resource id, rating) or raise ValueError with the item's error."""
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be an object.")
+
+    op = operation.get("op")
+    if op not in OPERATIONS:
+        raise ValueError(f"op must be one of {', '.join(OPERATIONS)}.")
+
+    try:
+        resource_id = int(operation.get("resource"))
+    except (TypeError, ValueError):
+        raise ValueError("resource must be a resource id.")
+
+    rating = None
+    if op == "rate":
+        try:
+            rating = int(operation.get("rating"))
+        except (TypeError, ValueError):
+            rating = None
+        if rating is None or not 1 <= rating <= 5:
+            raise ValueError("Rating must be an integer between 1 and 5.")
+
+    return op, resource_id, rating
+
+
+def apply_operations(user_id, operations):
+    """Apply ``operations`` for ``user_id`` and return one result per item."""
+    results = [None] * len(operations)
+    parsed = {}
+    for index, operation in enumerate(operations):
+        try:
+            parsed[index] = _parse(operation)
+        except ValueError as e:
+            results[index] = {"index": index, "status": "error", "error": str(e)}
+
+    existing = set(
+        Resource.objects.filter(
+            pk__in={resource_id for _, resource_id, _ in parsed.values()}
+        ).values_list("pk", flat=True)
+    )
+
+    saved = {}
+    ratings = {}
+    for index, (op, resource_id, rating) in parsed.items():
+        if resource_id not in existing:
+            results[index] = {
+                "index": index,
+                "status": "error",
+                "error": "Resource not found.",
+            }
+            continue
+        if op == "rate":
+            ratings[resource_id] = rating
+        else:
+            saved[resource_id] = op == "save"
+        results[index] = {"index": index, "status": "ok"}
+
+    if saved or ratings:
+        with transaction.atomic():
+            if saved:
+                _apply_saves(user_id, saved)
+            if ratings and settings.RATING_WRITE_BEHIND:
+                rating_buffer.submit(user_id, ratings)
+            elif ratings:
+                _apply_ratings(user_id, ratings)
+
+    return results
+
+
+def _apply_saves(user_id, saved):
+    to_save = [pk for pk, is_saved in saved.items() if is_saved]
+    to_unsave = [pk for pk, is_saved in saved.items() if not is_saved]
+
+    if to_save:
+        upsert(
+            UserSavedResource,
+            [
+                UserSavedResource(user_id=user_id, resource_id=pk, is_saved=True)
+                for pk in to_save
+            ],
+            unique_fields=["user", "resource"],
+            update_fields=["is_saved"],
+        )
+    if to_unsave:
+        UserSavedResource.objects.filter(
+            user_id=user_id, resource_id__in=to_unsave
+        ).delete()
+
+    invalidate(saved_resources(user_id))
+
+
+def _apply_ratings(user_id, ratings):
+    # The row locks keep the stored ratings the deltas are computed from in
+    # step with concurrent writes by the same user.
+    current = {
+        rating.resource_id: rating
+        for rating in UserRating.objects.select_for_update().filter(
+            user_id=user_id, resource_id__in=list(ratings)
+        )
+    }
+
+    to_create = []
+    to_update = []
+    deltas = defaultdict(list)
+    for resource_id, value in ratings.items():
+        rating = current.get(resource_id)
+        if rating is None:
+            to_create.append(
+                UserRating(user_id=user_id, resource_id=resource_id, rating=value)
+            )
+            deltas[value, 1].append(resource_id)
+        elif rating.rating != value:
+            deltas[value - rating.rating, 0].append(resource_id)
+            rating.rating = value
+            to_update.append(rating)
+
+    if to_create:
+        UserRating.objects.bulk_create(to_create)
+    if to_update:
+        UserRating.objects.bulk_update(to_update, ["rating"])
+
+    # Ratings are 1..5, so there are at most a handful of distinct deltas.
+    for (sum_delta, count_delta), resource_ids in deltas.items():
+        Resource.objects.filter(pk__in=resource_ids).apply_rating_delta(
+            sum_delta, count_delta
+        )
+    if deltas:
+        invalidate()
+        update_leaderboards(
+            [pk for resource_ids in deltas.values() for pk in resource_ids]
+        )
@@ -0,0 +1,150 @@
+"""
+In-process front for refresh token blacklist checks.
+
+simplejwt checks the blacklist with a join against the outstanding token
+table every time a refresh token is verified. With ``JWT_BLACKLIST_FILTER``
+enabled, ``core.tokens.RefreshToken`` asks ``blacklist_filter`` first:
+
+* a jti that was already found on the blacklist is answered from an LRU;
+* a jti the bloom filter has never seen is definitely not blacklisted;
+* anything else (real hits and the ~1% false positives) goes to the
+  database.
+
+The filter follows the ``LocalIndex`` protocol. Blacklisting a token bumps
+the shared "blacklist" version, both at once and after commit. Processes
+that see a new version load only the rows added since their last load.
+Pruned rows stay in the filter as harmless false positives until the next
+full rebuild. A bloom miss is only as current as that version, so the
+cache must be shared between processes; see ``core.checks``.
+"""
+
+import hashlib
+import math
+import time
+from datetime import timedelta
+
+from cachetools import LRUCache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .catalog import LocalIndex, get_version
+
+
+BLACKLIST = "blacklist"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class BlacklistFilter(LocalIndex):
+    version_name = BLACKLIST
+
+    MIN_CAPACITY = 10000
+    CONFIRMED_SIZE = 4096
+    # Rows blacklisted this long before the previous load are read again,
+    # which covers transactions that committed out of id order.
+    LOOKBACK = timedelta(minutes=5)
+
+    def __init__(self):
+        super().__init__()
+        self.bloom = BloomFilter(self.MIN_CAPACITY)
+        self.confirmed = LRUCache(maxsize=self.CONFIRMED_SIZE)
+        self.loaded_at = None
+        self.lookups = 0
+        self.database_checks = 0
+        self.lookup_seconds = 0.0
+
+    def build(self):
+        count = BlacklistedToken.objects.count()
+        self.bloom = BloomFilter(max(self.MIN_CAPACITY, 2 * count))
+        self.confirmed.clear()
+        self.loaded_at = None
+        self._load()
+
+    def update(self, jtis):
+        if self.bloom.count > self.bloom.capacity:
+            self.build()
+        else:
+            self._load()
+
+    def ensure_current(self):
+        # The blacklist only grows between prunes, so a filter that missed
+        # some bumps catches up incrementally instead of rebuilding.
+        with self._lock:
+            version = get_version(self.version_name)
+            if self.version != version:
+                if self.version is None:
+                    self.build()
+                else:
+                    self.update(())
+                self.version = version
+
+    def is_blacklisted(self, jti):
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                self.lookups += 1
+                if jti in self.confirmed:
+                    return True
+                self.ensure_current()
+                if jti not in self.bloom:
+                    return False
+                self.database_checks += 1
+
+            blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+            if blacklisted:
+                with self._lock:
+                    self.confirmed[jti] = True
+            return blacklisted
+        finally:
+            with self._lock:
+                self.lookup_seconds += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "database_checks": self.database_checks,
+                "avg_lookup_ms": (
+                    self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0
+                ),
+                "filter_entries": self.bloom.count,
+            }
+
+    def _load(self):
+        loaded_at = timezone.now()
+        rows = BlacklistedToken.objects.all()
+        if self.loaded_at is not None:
+            rows = rows.filter(blacklisted_at__gte=self.loaded_at - self.LOOKBACK)
+        for jti in rows.values_list("token__jti", flat=True).iterator(
+            chunk_size=10000
+        ):
+            if jti not in self.bloom:
+                self.bloom.add(jti)
+        self.loaded_at = loaded_at
+
+
+blacklist_filter = BlacklistFilter()
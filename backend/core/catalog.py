@@ -0,0 +1,103 @@
+"""
+Version counters for the public catalog and per-user state.
+
+Cached catalog responses and ETags are derived from the current version,
+so bumping it invalidates every cached page at once. Each user's saved
+resources have a version of their own. Versions live in the default
+cache (shared between processes when a file or Redis backend is
+configured) and start from a timestamp, so a counter that was evicted
+never restarts at a value an older cached page was stored under.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+CATALOG = "catalog"
+
+VERSION_KEY = "catalog-version:{}"
+MODIFIED_KEY = "catalog-modified:{}"
+
+
+def get_version(name=CATALOG):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_last_modified(name=CATALOG):
+    """Unix time of the last bump, or of the first lookup after eviction."""
+    key = MODIFIED_KEY.format(name)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), timeout=None)
+        modified = cache.get(key)
+    return modified
+
+
+def bump_version(name=CATALOG):
+    cache.set(MODIFIED_KEY.format(name), int(time.time()), timeout=None)
+    key = VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return get_version(name)
+
+
+def saved_resources(user_id):
+    return f"saved:{user_id}"
+
+
+def invalidate(name=CATALOG):
+    """
+    Bump the version now and again once the current transaction commits.
+
+    The second bump drops pages another request may have cached from
+    the pre-commit data under the intermediate version.
+    """
+    bump_version(name)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+class LocalIndex:
+    """
+    Base class for in-process indexes derived from the database.
+
+    The index remembers the shared version it was built at. Writers call
+    ``refresh`` after committing, which bumps the version and patches the
+    index in place if it had seen every earlier bump; any other process
+    notices the new version and rebuilds on its next lookup.
+    """
+
+    version_name = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def update(self, resource_ids):
+        raise NotImplementedError
+
+    def ensure_current(self):
+        with self._lock:
+            version = get_version(self.version_name)
+            if self.version != version:
+                self.build()
+                self.version = version
+
+    def refresh(self, resource_ids):
+        with self._lock:
+            previous = self.version
+            version = bump_version(self.version_name)
+            if previous is not None and previous == version - 1:
+                self.update(resource_ids)
+                self.version = version
@@ -0,0 +1,75 @@
+"""
+System checks for the cache.
+
+The catalog versions in ``core.catalog`` are kept in the default cache.
+Every process must see the same counters for cached pages and in-process
+indexes to follow writes made elsewhere, which a per-process backend
+such as the default ``LocMemCache`` cannot provide. That is tolerable for
+caching, but not for features that trust an index or a marker in the
+cache to be current (the blacklist filter, stateless JWT users), so those
+refuse to start on such a backend.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+SHARED_CACHE_HINT = (
+    "Set CACHE_BACKEND and CACHE_LOCATION to a cache every process can "
+    "reach, e.g. django.core.cache.backends.redis.RedisCache or "
+    "django.core.cache.backends.db.DatabaseCache."
+)
+
+
+def uses_shared_cache():
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if uses_shared_cache():
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process, so with more than "
+            "one worker cached responses and indexes miss other workers' "
+            "writes.",
+            hint=SHARED_CACHE_HINT,
+            id="core.W001",
+        )
+    ]
+
+
+@register(Tags.caches, Tags.security)
+def check_blacklist_filter_cache(app_configs, **kwargs):
+    if not settings.JWT_BLACKLIST_FILTER or uses_shared_cache():
+        return []
+    return [
+        Error(
+            "JWT_BLACKLIST_FILTER needs a cache shared between processes. "
+            "Otherwise a refresh token blacklisted by one process is still "
+            "accepted by the others.",
+            hint=SHARED_CACHE_HINT,
+            id="core.E001",
+        )
+    ]
+
+
+@register(Tags.caches, Tags.security)
+def check_stateless_user_cache(app_configs, **kwargs):
+    if not settings.JWT_STATELESS_USER or uses_shared_cache():
+        return []
+    return [
+        Error(
+            "JWT_STATELESS_USER needs a cache shared between processes. "
+            "Otherwise a user deactivated through one process keeps "
+            "their access in the others until the token expires.",
+            hint=SHARED_CACHE_HINT,
+            id="core.E002",
+        )
+    ]
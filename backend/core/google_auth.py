@@ -0,0 +1,123 @@
+"""
+Google ID token verification with reused signing certificates.
+
+``google.oauth2.id_token`` downloads Google's certificates on every
+verification. ``CachedRequest`` is a google-auth transport that sends
+requests through one pooled ``requests.Session`` and keeps successful GET
+responses for as long as their ``Cache-Control: max-age`` allows, so on
+the hot path verifying a token is a local signature check.
+"""
+
+import threading
+import time
+
+import requests
+from google.auth import transport
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# A token signed with a key we have not seen yet triggers at most one early
+# certificate refetch per interval.
+MIN_REFETCH_INTERVAL = 60
+
+
+def parse_max_age(headers):
+    """Seconds a response may be reused for, or 0 if it must not be."""
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+    try:
+        max_age = int(directives.get("max-age", 0))
+        age = int(headers.get("Age", 0))
+    except ValueError:
+        return 0
+    return max(0, max_age - age)
+
+
+class CachedResponse(transport.Response):
+    def __init__(self, response):
+        self._status = response.status
+        self._headers = dict(response.headers)
+        self._data = response.data
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def data(self):
+        return self._data
+
+
+class CachedRequest(transport.Request):
+    def __init__(self, session=None, clock=time.monotonic):
+        self._request = google_requests.Request(session or requests.Session())
+        self._clock = clock
+        self._lock = threading.Lock()
+        # url -> (fetched at, expires at, response)
+        self._responses = {}
+
+    def __call__(self, url, method="GET", body=None, headers=None, **kwargs):
+        if method != "GET" or body is not None:
+            return self._request(url, method=method, body=body, headers=headers, **kwargs)
+
+        now = self._clock()
+        with self._lock:
+            cached = self._responses.get(url)
+        if cached is not None and now < cached[1]:
+            return cached[2]
+
+        response = self._request(url, method=method, headers=headers, **kwargs)
+        max_age = parse_max_age(response.headers)
+        if response.status == 200 and max_age:
+            response = CachedResponse(response)
+            with self._lock:
+                self._responses[url] = (now, now + max_age, response)
+        return response
+
+    def invalidate(self, url, min_age=0):
+        """Drop the cached response for ``url`` if it is at least ``min_age`` old."""
+        with self._lock:
+            cached = self._responses.get(url)
+            if cached is None or self._clock() - cached[0] < min_age:
+                return False
+            del self._responses[url]
+            return True
+
+
+google_request = CachedRequest()
+
+
+def verify_google_id_token(token, audience, certs_url=GOOGLE_CERTS_URL, request=None):
+    """
+    Same checks as ``id_token.verify_oauth2_token``. Raises ``ValueError``
+    if the token is invalid.
+    """
+    request = request or google_request
+    try:
+        idinfo = id_token.verify_token(
+            token, request, audience=audience, certs_url=certs_url
+        )
+    except ValueError:
+        # Google may rotate keys before the cached certificates expire.
+        if not request.invalidate(certs_url, min_age=MIN_REFETCH_INTERVAL):
+            raise
+        idinfo = id_token.verify_token(
+            token, request, audience=audience, certs_url=certs_url
+        )
+
+    if idinfo["iss"] not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {idinfo['iss']}")
+    return idinfo
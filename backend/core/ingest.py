@@ -0,0 +1,327 @@
+"""
+Bulk ingest of the upstream tag and resource catalog.
+
+Every tag and resource stores a ``content_hash`` of the upstream fields it
+was built from. A batch is diffed against the hashes that already exist
+(looked up by ``external_id``), unchanged rows are skipped without being
+loaded, and only the difference is written, using
+``bulk_create``/``bulk_update`` and direct writes to the ``Resource.tags``
+through table instead of per-row ORM calls.
+"""
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import invalidate
+from .leaderboards import update_on_commit as update_leaderboards
+from .models import Resource, Tag
+from .search import build_document, refresh_tag_documents, search_index
+from .tag_index import tag_index
+from .utils import chunked
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+RESOURCE_FIELDS = ("author", "name", "url", "created_at", "search_document")
+
+ResourceTag = Resource.tags.through
+
+
+@dataclass
+class IngestCounts:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def fingerprint(*parts):
+    payload = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def parse_created_at(value):
+    if value in (None, ""):
+        return None
+    value = Resource._meta.get_field("created_at").to_python(value)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+    return value
+
+
+class CatalogIngest:
+    """
+    Applies batches of upstream tags and resources to the database.
+
+    Tags must be ingested before the resources that reference them, and
+    ``finish`` must be called once every resource batch has been applied.
+    The caller is responsible for the surrounding transaction, see
+    ``ingest_catalog``.
+    """
+
+    def __init__(self, batch_size=None, mark_stale=False):
+        self.batch_size = batch_size or getattr(
+            settings, "INGEST_BATCH_SIZE", DEFAULT_BATCH_SIZE
+        )
+        self.mark_stale = mark_stale
+        self.tags = IngestCounts()
+        self.resources = IngestCounts()
+        self.stale = 0
+        self._tag_ids = None
+        self._tag_names = None
+        self._seen = set()
+        self._changed = set()
+        self._updated = set()
+        self._renamed_tags = set()
+        self._revived = 0
+
+    def summary(self):
+        summary = {"tags": self.tags.as_dict(), "resources": self.resources.as_dict()}
+        if self.mark_stale:
+            summary["resources"]["stale"] = self.stale
+        return summary
+
+    @property
+    def tag_ids(self):
+        if self._tag_ids is None:
+            self._load_tags()
+        return self._tag_ids
+
+    @property
+    def tag_names(self):
+        if self._tag_names is None:
+            self._load_tags()
+        return self._tag_names
+
+    def _load_tags(self):
+        self._tag_ids = {}
+        self._tag_names = {}
+        for external_id, pk, name in Tag.objects.values_list("external_id", "pk", "tag"):
+            self._tag_ids[external_id] = pk
+            self._tag_names[pk] = name
+
+    def ingest_tags(self, tags_data):
+        for batch in chunked(tags_data, self.batch_size):
+            self._ingest_tag_batch(batch)
+
+    def ingest_resources(self, resources_data):
+        for batch in chunked(resources_data, self.batch_size):
+            self._ingest_resource_batch(batch)
+
+    def mark_seen(self, external_ids):
+        """
+        Count resources ingested by earlier runs as seen, so that ``finish``
+        with ``mark_stale`` only marks resources missing from all of them.
+        """
+        for batch in chunked(external_ids, self.batch_size):
+            self._seen.update(
+                Resource.objects.filter(external_id__in=batch).values_list(
+                    "pk", flat=True
+                )
+            )
+
+    @property
+    def changed(self):
+        return bool(
+            self.tags.created
+            or self.tags.updated
+            or self.resources.created
+            or self.resources.updated
+            or self.stale
+            or self._revived
+        )
+
+    def finish(self):
+        if self.mark_stale:
+            live = Resource.objects.filter(is_stale=False).values_list("pk", flat=True)
+            vanished = set(live) - self._seen
+            for batch in chunked(vanished, self.batch_size):
+                self.stale += Resource.objects.filter(pk__in=batch).update(
+                    is_stale=True
+                )
+
+        if self._renamed_tags:
+            refresh_tag_documents(self._renamed_tags)
+        if self._changed:
+            changed = self._changed
+            transaction.on_commit(lambda: search_index.refresh(changed))
+        if self._updated:
+            # Retagged resources move between tag leaderboards. New ones have
+            # no ratings, so they are on none yet.
+            update_leaderboards(self._updated)
+        if self.changed:
+            changed = self._changed
+            transaction.on_commit(lambda: tag_index.refresh(changed))
+            invalidate()
+
+    def _ingest_tag_batch(self, batch):
+        incoming = {str(item["id"]): item["tag"] for item in batch}
+        existing = {
+            external_id: (pk, content_hash)
+            for external_id, pk, content_hash in Tag.objects.filter(
+                external_id__in=list(incoming)
+            ).values_list("external_id", "pk", "content_hash")
+        }
+
+        to_create = []
+        to_update = []
+        for external_id, name in incoming.items():
+            content_hash = fingerprint(name)
+            pk, current_hash = existing.get(external_id, (None, None))
+            if pk is None:
+                to_create.append(
+                    Tag(external_id=external_id, tag=name, content_hash=content_hash)
+                )
+            elif current_hash != content_hash:
+                to_update.append(Tag(pk=pk, tag=name, content_hash=content_hash))
+            else:
+                self.tags.unchanged += 1
+
+        if to_create:
+            Tag.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            Tag.objects.bulk_update(
+                to_update, ["tag", "content_hash"], batch_size=self.batch_size
+            )
+            self._renamed_tags.update(tag.pk for tag in to_update)
+        if to_create or to_update:
+            self._tag_ids = self._tag_names = None
+
+        self.tags.created += len(to_create)
+        self.tags.updated += len(to_update)
+
+    def _ingest_resource_batch(self, batch):
+        incoming = {}
+        for item in batch:
+            external_id = str(item["id"])
+            tag_ids = self._resolve_tags(item.get("appliedTags", []))
+            fields = {
+                "author": item["author"],
+                "name": item["name"],
+                "url": item["url"],
+                "created_at": item.get("createdAt"),
+            }
+            incoming[external_id] = (
+                fields,
+                tag_ids,
+                fingerprint(fields, sorted(tag_ids)),
+            )
+
+        existing = {
+            external_id: (pk, content_hash, is_stale)
+            for external_id, pk, content_hash, is_stale in Resource.objects.filter(
+                external_id__in=list(incoming)
+            ).values_list("external_id", "pk", "content_hash", "is_stale")
+        }
+
+        to_create = []
+        to_update = []
+        to_revive = []
+        for external_id, (fields, tag_ids, content_hash) in incoming.items():
+            pk, current_hash, is_stale = existing.get(external_id, (None, None, False))
+            if pk is not None:
+                self._seen.add(pk)
+                if is_stale:
+                    to_revive.append(pk)
+                if current_hash == content_hash:
+                    self.resources.unchanged += 1
+                    continue
+
+            resource = Resource(
+                pk=pk,
+                external_id=external_id,
+                content_hash=content_hash,
+                search_document=build_document(
+                    fields["name"],
+                    fields["author"],
+                    [self.tag_names[tag_id] for tag_id in tag_ids.values()],
+                ),
+                **dict(fields, created_at=parse_created_at(fields["created_at"])),
+            )
+            if pk is None:
+                to_create.append((resource, tag_ids))
+            else:
+                to_update.append((resource, tag_ids))
+
+        if to_create:
+            Resource.objects.bulk_create(
+                [resource for resource, _ in to_create], batch_size=self.batch_size
+            )
+            created_ids = dict(
+                Resource.objects.filter(
+                    external_id__in=[resource.external_id for resource, _ in to_create]
+                ).values_list("external_id", "pk")
+            )
+            for resource, _ in to_create:
+                resource.pk = created_ids[resource.external_id]
+                self._seen.add(resource.pk)
+                self._changed.add(resource.pk)
+        if to_update:
+            self._changed.update(resource.pk for resource, _ in to_update)
+            self._updated.update(resource.pk for resource, _ in to_update)
+            Resource.objects.bulk_update(
+                [resource for resource, _ in to_update],
+                RESOURCE_FIELDS + ("content_hash",),
+                batch_size=self.batch_size,
+            )
+        if to_revive:
+            Resource.objects.filter(pk__in=to_revive).update(is_stale=False)
+            self._revived += len(to_revive)
+
+        self._sync_tag_links(to_create, to_update)
+
+        self.resources.created += len(to_create)
+        self.resources.updated += len(to_update)
+
+    def _sync_tag_links(self, created, updated):
+        links = {}
+        if updated:
+            through_rows = ResourceTag.objects.filter(
+                resource_id__in=[resource.pk for resource, _ in updated]
+            ).values_list("pk", "resource_id", "tag_id")
+            for pk, resource_id, tag_id in through_rows:
+                links.setdefault(resource_id, {})[tag_id] = pk
+
+        links_to_add = []
+        links_to_remove = []
+        for resource, tag_ids in created + updated:
+            current = links.get(resource.pk, {})
+            wanted = set(tag_ids.values())
+            links_to_add.extend(
+                ResourceTag(resource_id=resource.pk, tag_id=tag_id)
+                for tag_id in wanted - current.keys()
+            )
+            links_to_remove.extend(
+                pk for tag_id, pk in current.items() if tag_id not in wanted
+            )
+
+        if links_to_remove:
+            ResourceTag.objects.filter(pk__in=links_to_remove).delete()
+        if links_to_add:
+            ResourceTag.objects.bulk_create(links_to_add, batch_size=self.batch_size)
+
+    def _resolve_tags(self, external_ids):
+        tag_ids = self.tag_ids
+        return {
+            str(external_id): tag_ids[str(external_id)]
+            for external_id in external_ids
+            if str(external_id) in tag_ids
+        }
+
+
+def ingest_catalog(tags_data, resources_data, batch_size=None, mark_stale=False):
+    ingest = CatalogIngest(batch_size=batch_size, mark_stale=mark_stale)
+
+    with transaction.atomic():
+        ingest.ingest_tags(tags_data)
+        ingest.ingest_resources(resources_data)
+        ingest.finish()
+
+    return ingest.summary()
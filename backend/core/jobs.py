@@ -0,0 +1,286 @@
+"""
+A background job queue kept in the database.
+
+``enqueue`` stores a ``Job`` and the ``run_jobs`` worker runs it with the
+handler registered for its kind. Workers claim jobs with a conditional
+UPDATE, so several of them (on several hosts) can share the queue
+without a broker or row locks.
+
+Handlers work in batches and commit each batch together with a
+``checkpoint`` of the job's cursor and progress, which doubles as the
+worker's heartbeat. A running job whose heartbeat is older than
+``STALE_AFTER`` is taken to have lost its worker: the next worker claims
+it and the handler resumes from the saved cursor. After ``MAX_ATTEMPTS``
+claims the job is marked failed instead. A worker whose job was claimed
+away finds out at its next checkpoint, which raises ``JobLost`` and rolls
+back that batch. Finished jobs keep their result but drop their payload.
+
+Handlers invalidate cached pages and in-process indexes through the
+versions in the default cache, so the workers and the web processes must
+share it; ``run_jobs`` refuses to start otherwise.
+"""
+
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import DateTimeField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import bump_version, invalidate
+from . import leaderboards
+from .ingest import CatalogIngest, IngestCounts
+from .models import Job, Resource
+from .search import refresh_documents, search_index
+from .tag_index import tag_index
+
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+DEFAULT_BATCH_SIZE = 1000
+
+HANDLERS = {}
+
+
+class JobLost(Exception):
+    """The job was claimed by another worker."""
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue(kind, payload=None, total=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, payload=payload or {}, total=total)
+
+
+def claim(worker, stale_after=STALE_AFTER, pk=None):
+    """
+    Take the oldest queued job, or a running one whose worker stopped
+    sending heartbeats, and return it; ``None`` if there is nothing to do.
+    """
+    now = timezone.now()
+    jobs = Job.objects.all() if pk is None else Job.objects.filter(pk=pk)
+    stale = Q(status=Job.RUNNING, heartbeat_at__lt=now - stale_after)
+
+    jobs.filter(stale, attempts__gte=MAX_ATTEMPTS).update(
+        status=Job.FAILED,
+        error=f"Gave up after {MAX_ATTEMPTS} attempts; the worker stopped responding.",
+        finished_at=now,
+        payload={},
+    )
+
+    claimable = Q(status=Job.QUEUED) | stale
+    candidates = jobs.filter(claimable).order_by("pk").values_list("pk", flat=True)
+    for candidate in candidates[:10]:
+        # Another worker may have taken the job since it was listed.
+        claimed = Job.objects.filter(claimable, pk=candidate).update(
+            status=Job.RUNNING,
+            worker=worker,
+            attempts=F("attempts") + 1,
+            started_at=Coalesce("started_at", Value(now, DateTimeField())),
+            heartbeat_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+    return None
+
+
+class JobRun:
+    """What a handler gets: the claimed job and a way to save progress."""
+
+    def __init__(self, job, worker):
+        self.job = job
+        self.worker = worker
+
+    @property
+    def payload(self):
+        return self.job.payload
+
+    @property
+    def cursor(self):
+        return self.job.cursor
+
+    def checkpoint(self, cursor, progress=None, total=None):
+        """
+        Save the cursor and send a heartbeat. Call it inside the
+        transaction of the batch it covers, so the two commit together.
+        """
+        fields = {"cursor": cursor, "heartbeat_at": timezone.now()}
+        if progress is not None:
+            fields["progress"] = progress
+        if total is not None:
+            fields["total"] = total
+
+        updated = Job.objects.filter(
+            pk=self.job.pk, status=Job.RUNNING, worker=self.worker
+        ).update(**fields)
+        if not updated:
+            raise JobLost(f"Job {self.job.pk} was claimed by another worker.")
+
+        for name, value in fields.items():
+            setattr(self.job, name, value)
+
+
+def run_job(job, worker):
+    """Run a claimed job to completion and record the outcome."""
+    try:
+        result = HANDLERS[job.kind](JobRun(job, worker))
+    except JobLost:
+        logger.warning("Job %s was claimed by another worker, stopping", job.pk)
+        return
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job.pk, job.kind)
+        status, fields = Job.FAILED, {"error": f"{type(e).__name__}: {e}"}
+    else:
+        status, fields = Job.SUCCEEDED, {"result": result}
+
+    # The payload (a whole upload, for syncs) is only needed to run the job.
+    Job.objects.filter(pk=job.pk, worker=worker).update(
+        status=status, finished_at=timezone.now(), payload={}, **fields
+    )
+    job.refresh_from_db()
+
+
+def run_now(job):
+    """Run a queued job in this process, for callers that want to wait."""
+    worker = worker_name()
+    claimed = claim(worker, pk=job.pk)
+    if claimed is not None:
+        run_job(claimed, worker)
+    job.refresh_from_db()
+    return job
+
+
+@handler("sync_catalog")
+def sync_catalog(run):
+    """
+    Ingest an upstream catalog payload, committing one batch of resources
+    at a time. Unlike ``ingest_catalog``, readers see the catalog fill in
+    batch by batch.
+    """
+    tags = run.payload.get("tags", [])
+    resources = run.payload.get("resources", [])
+    mark_stale = run.payload.get("mark_stale", False)
+    batch_size = CatalogIngest(run.payload.get("batch_size")).batch_size
+
+    cursor = {
+        "tags": None,
+        "resources": IngestCounts().as_dict(),
+        "offset": 0,
+        "stale": None,
+        **run.cursor,
+    }
+
+    if cursor["tags"] is None:
+        with transaction.atomic():
+            ingest = CatalogIngest(batch_size)
+            ingest.ingest_tags(tags)
+            ingest.finish()
+            cursor["tags"] = ingest.tags.as_dict()
+            run.checkpoint(cursor, progress=0, total=len(resources))
+
+    while cursor["offset"] < len(resources):
+        batch = resources[cursor["offset"] : cursor["offset"] + batch_size]
+        with transaction.atomic():
+            ingest = CatalogIngest(batch_size)
+            ingest.ingest_resources(batch)
+            ingest.finish()
+            for name, count in ingest.resources.as_dict().items():
+                cursor["resources"][name] += count
+            cursor["offset"] += len(batch)
+            run.checkpoint(cursor, progress=cursor["offset"])
+
+    if mark_stale and cursor["stale"] is None:
+        with transaction.atomic():
+            ingest = CatalogIngest(batch_size, mark_stale=True)
+            ingest.mark_seen(str(item["id"]) for item in resources)
+            ingest.finish()
+            cursor["stale"] = ingest.stale
+            run.checkpoint(cursor)
+
+    summary = {"tags": cursor["tags"], "resources": dict(cursor["resources"])}
+    if mark_stale:
+        summary["resources"]["stale"] = cursor["stale"]
+    return summary
+
+
+def resource_batches(run):
+    """Batches of resource pks, starting after the one saved in the cursor."""
+    batch_size = run.payload.get("batch_size") or DEFAULT_BATCH_SIZE
+    if run.job.total is None:
+        run.job.total = Resource.objects.count()
+
+    after = run.cursor.get("after", 0)
+    while True:
+        pks = list(
+            Resource.objects.filter(pk__gt=after)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        yield pks
+        after = pks[-1]
+
+
+@handler("rebuild_ratings")
+def rebuild_ratings(run):
+    """
+    Recompute the denormalized rating aggregates of every resource, then
+    the leaderboards scored from them.
+    """
+    for pks in resource_batches(run):
+        with transaction.atomic():
+            Resource.objects.filter(pk__in=pks).rebuild_rating_stats()
+            run.checkpoint(
+                {"after": pks[-1]},
+                progress=run.job.progress + len(pks),
+                total=run.job.total,
+            )
+    invalidate()
+    leaderboards.refresh(run.payload.get("batch_size") or DEFAULT_BATCH_SIZE)
+    return {"resources": run.job.progress}
+
+
+@handler("rebuild_indexes")
+def rebuild_indexes(run):
+    """
+    Rebuild every stored search document, then make each process rebuild
+    its in-memory search and tag indexes.
+    """
+    batch_size = run.payload.get("batch_size") or DEFAULT_BATCH_SIZE
+    for pks in resource_batches(run):
+        with transaction.atomic():
+            refresh_documents(pks, batch_size=batch_size)
+            run.checkpoint(
+                {"after": pks[-1]},
+                progress=run.job.progress + len(pks),
+                total=run.job.total,
+            )
+    bump_version(search_index.version_name)
+    bump_version(tag_index.version_name)
+    invalidate()
+    return {"resources": run.job.progress}
+
+
+@handler("refresh_leaderboards")
+def refresh_leaderboards(run):
+    """Rebuild the leaderboards; see ``core.leaderboards``."""
+    return leaderboards.refresh(run.payload.get("batch_size") or DEFAULT_BATCH_SIZE)
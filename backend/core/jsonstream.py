@@ -0,0 +1,94 @@
+"""
+Incremental parsing of large JSON arrays.
+
+``iter_json_array`` yields the elements of a top-level JSON array while
+reading the underlying binary stream in fixed-size chunks, so only the
+element being decoded (plus one chunk) is held in memory at a time.
+"""
+
+import codecs
+import json
+import re
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER_TAIL = re.compile(r"[0-9eE.+\-]*")
+
+
+class JSONArrayReader:
+    def __init__(self, stream, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def __iter__(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self.position += 1
+            return
+
+        while True:
+            yield self._decode_value()
+
+            separator = self._peek()
+            self.position += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise self._error("Expecting ',' delimiter")
+
+    def _fill(self):
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        text = self.text_decoder.decode(chunk, final=self.eof)
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return bool(chunk)
+
+    def _peek(self):
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise self._error("Unexpected end of JSON array")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self.position += 1
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A value followed by nothing but number characters may have
+            # been cut short, e.g. a number split across two chunks.
+            if NUMBER_TAIL.fullmatch(self.buffer, end) and self._fill():
+                continue
+
+            self.position = end
+            return value
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self.buffer, self.position)
+
+
+def iter_json_array(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    return iter(JSONArrayReader(stream, chunk_size=chunk_size))
@@ -0,0 +1,203 @@
+"""
+Precomputed "top rated" and "trending" leaderboards.
+
+Every rated resource has a ``LeaderboardEntry`` on the "top" board and on
+the board of each of its tags. Resources rated in the last
+``LEADERBOARD_TRENDING_DAYS`` also have one on "trending", scored from
+those recent ratings only. Scores are Bayesian averages: each resource
+starts with ``LEADERBOARD_PRIOR_WEIGHT`` ratings at the mean rating, so a
+single 5 does not outrank a hundred 4s. Reading a board is a range scan
+of the (board, -score) index, with no aggregation at request time.
+
+``refresh`` rebuilds every board and recomputes the prior means. It should
+run on a schedule (the ``refresh_leaderboards`` command), because the
+trending window moves and the means drift. Aggregate repairs refresh
+too. Between refreshes, rating writes and catalog ingests call
+``update_on_commit`` to rescore the resources they touched with the
+stored means.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .catalog import invalidate
+from .models import LeaderboardEntry, Resource, UserRating
+from .utils import chunked, upsert
+
+
+logger = logging.getLogger(__name__)
+
+TOP = "top"
+TRENDING = "trending"
+
+PRIORS_KEY = "leaderboard-priors"
+# The prior mean while nothing has been rated yet.
+DEFAULT_MEAN = 3.0
+
+_pending = threading.local()
+
+
+def tag_board(tag_id):
+    return f"tag:{tag_id}"
+
+
+def bayesian_score(total, count, mean):
+    weight = settings.LEADERBOARD_PRIOR_WEIGHT
+    return (weight * mean + total) / (weight + count)
+
+
+def trending_since():
+    return timezone.now() - timedelta(days=settings.LEADERBOARD_TRENDING_DAYS)
+
+
+def compute_priors():
+    """The mean rating overall and within the trending window."""
+
+    def mean(totals):
+        return totals["total"] / totals["count"] if totals["count"] else None
+
+    overall = mean(
+        Resource.objects.aggregate(total=Sum("rating_sum"), count=Sum("rating_count"))
+    )
+    recent = mean(
+        UserRating.objects.filter(created_at__gte=trending_since()).aggregate(
+            total=Sum("rating"), count=Count("pk")
+        )
+    )
+    overall = DEFAULT_MEAN if overall is None else overall
+    return {TOP: overall, TRENDING: overall if recent is None else recent}
+
+
+def get_priors():
+    priors = cache.get(PRIORS_KEY)
+    if priors is None:
+        priors = compute_priors()
+        cache.set(PRIORS_KEY, priors, timeout=None)
+    return priors
+
+
+def score_entries(resource_ids=None):
+    """Unsaved entries for ``resource_ids``, or for every rated resource."""
+    priors = get_priors()
+    resources = Resource.objects.filter(rating_count__gt=0)
+    recent = UserRating.objects.filter(created_at__gte=trending_since())
+    if resource_ids is not None:
+        resources = resources.filter(pk__in=resource_ids)
+        recent = recent.filter(resource_id__in=resource_ids)
+
+    # One row per tag (one with tag None for untagged resources), ordered
+    # so that a resource's rows are adjacent.
+    entries = []
+    previous = None
+    for pk, total, count, tag_id in resources.order_by("pk").values_list(
+        "pk", "rating_sum", "rating_count", "tags"
+    ):
+        fields = {
+            "resource_id": pk,
+            "score": bayesian_score(total, count, priors[TOP]),
+            "rating_avg": total / count,
+            "rating_count": count,
+        }
+        if pk != previous:
+            entries.append(LeaderboardEntry(board=TOP, **fields))
+            previous = pk
+        if tag_id is not None:
+            entries.append(LeaderboardEntry(board=tag_board(tag_id), **fields))
+
+    recent = (
+        recent.order_by()
+        .values("resource")
+        .annotate(total=Sum("rating"), count=Count("pk"))
+        .values_list("resource", "total", "count")
+    )
+    for pk, total, count in recent:
+        entries.append(
+            LeaderboardEntry(
+                board=TRENDING,
+                resource_id=pk,
+                score=bayesian_score(total, count, priors[TRENDING]),
+                rating_avg=total / count,
+                rating_count=count,
+            )
+        )
+    return entries
+
+
+def refresh(batch_size=1000):
+    """Rebuild every board; return the number of entries per board kind."""
+    cache.set(PRIORS_KEY, compute_priors(), timeout=None)
+    entries = score_entries()
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=batch_size)
+        invalidate()
+
+    counts = {TOP: 0, TRENDING: 0, "tag": 0}
+    for entry in entries:
+        counts[entry.board.partition(":")[0]] += 1
+    return counts
+
+
+def update(resource_ids):
+    """
+    Rescore ``resource_ids`` on every board they belong on, and take them off
+    the boards they left. Entries are upserted rather than deleted and
+    recreated, so two rescorings of the same resource can run at once.
+    """
+    for batch in chunked(resource_ids, 1000):
+        entries = score_entries(batch)
+        wanted = {(entry.board, entry.resource_id) for entry in entries}
+        with transaction.atomic():
+            upsert(
+                LeaderboardEntry,
+                entries,
+                unique_fields=["board", "resource"],
+                update_fields=["score", "rating_avg", "rating_count"],
+            )
+            left = [
+                pk
+                for pk, board, resource_id in LeaderboardEntry.objects.filter(
+                    resource_id__in=batch
+                ).values_list("pk", "board", "resource_id")
+                if (board, resource_id) not in wanted
+            ]
+            if left:
+                LeaderboardEntry.objects.filter(pk__in=left).delete()
+            invalidate()
+
+
+def update_on_commit(resource_ids):
+    """
+    ``update`` the resources once the current transaction commits, together
+    with every other resource queued by this thread's transaction.
+    """
+    if not settings.LEADERBOARD_LIVE_UPDATES:
+        return
+    # A rolled-back transaction leaves its ids behind; rescoring them along
+    # with the next commit is harmless.
+    if not hasattr(_pending, "resource_ids"):
+        _pending.resource_ids = set()
+    _pending.resource_ids.update(resource_ids)
+    transaction.on_commit(_update_pending)
+
+
+def _update_pending():
+    resource_ids = getattr(_pending, "resource_ids", None)
+    if resource_ids:
+        _pending.resource_ids = set()
+        # The writes that queued the ids have committed; a failed rescore
+        # must not turn them into errors. The next refresh catches up.
+        try:
+            update(sorted(resource_ids))
+        except Exception:
+            logger.exception(
+                "Rescoring leaderboards for %d resources failed", len(resource_ids)
+            )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import HANDLERS, enqueue
+
+
+class Command(BaseCommand):
+    help = "Queue a background job for the run_jobs worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(HANDLERS))
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        payload = {}
+        if options["batch_size"]:
+            payload["batch_size"] = options["batch_size"]
+        job = enqueue(options["kind"], payload)
+        self.stdout.write(self.style.SUCCESS(f"queued {job}"))
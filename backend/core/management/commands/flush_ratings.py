@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.checks import SHARED_CACHE_HINT, uses_shared_cache
+from core.rating_buffer import flush_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the ratings buffered in write-behind mode (RATING_WRITE_BEHIND) "
+        "to UserRating and the rating aggregates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.0,
+            help="Keep running and flush every this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        # As for run_jobs: the web processes only see the flushed ratings
+        # once the version bumps reach their cache.
+        if not uses_shared_cache():
+            raise CommandError(
+                "flush_ratings needs a cache shared with the web processes. "
+                + SHARED_CACHE_HINT
+            )
+
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            counts = flush_all(options["batch_size"])
+            if counts.pending or not options["interval"]:
+                self.stdout.write(
+                    f"flushed {counts.pending} pending ratings "
+                    f"({counts.created} created, {counts.updated} updated, "
+                    f"{counts.unchanged} unchanged) "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
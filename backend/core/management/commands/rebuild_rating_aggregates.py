@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from core import leaderboards
+from core.catalog import invalidate
+from core.models import Resource, UserRating
+from core.utils import chunked
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized rating_sum/rating_count/rating_avg columns "
+        "on Resource from UserRating, or verify them with --verify."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report resources whose aggregates are out of date.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pks = Resource.objects.order_by("pk").values_list("pk", flat=True)
+        mismatched = 0
+        total = 0
+
+        for batch in chunked(pks.iterator(), options["batch_size"]):
+            total += len(batch)
+            stale = self._find_mismatches(batch)
+            mismatched += len(stale)
+
+            if options["verify"]:
+                for pk, stored, actual in stale:
+                    self.stdout.write(
+                        f"resource {pk}: stored sum/count {stored}, actual {actual}"
+                    )
+            elif stale:
+                with transaction.atomic():
+                    Resource.objects.filter(
+                        pk__in=[pk for pk, _, _ in stale]
+                    ).rebuild_rating_stats()
+
+        if options["verify"]:
+            if mismatched:
+                raise CommandError(
+                    f"{mismatched} of {total} resources have stale rating aggregates."
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f"All {total} resources have up-to-date aggregates.")
+            )
+        else:
+            if mismatched:
+                invalidate()
+                leaderboards.refresh()
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt aggregates for {mismatched} of {total} resources.")
+            )
+
+    def _find_mismatches(self, pks):
+        actual = {
+            row["resource_id"]: (row["total"], row["count"])
+            for row in UserRating.objects.filter(resource_id__in=pks)
+            .order_by()
+            .values("resource_id")
+            .annotate(total=Sum("rating"), count=Count("pk"))
+        }
+        stored = Resource.objects.filter(pk__in=pks).values_list(
+            "pk", "rating_sum", "rating_count", "rating_avg"
+        )
+
+        mismatches = []
+        for pk, rating_sum, rating_count, rating_avg in stored:
+            total, count = actual.get(pk, (0, 0))
+            expected_avg = total / count if count else 0
+            if (rating_sum, rating_count) != (total, count) or abs(
+                rating_avg - expected_avg
+            ) > 1e-9:
+                mismatches.append((pk, (rating_sum, rating_count), (total, count)))
+        return mismatches
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.leaderboards import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the top rated, per tag and trending leaderboards and "
+        "recompute the mean ratings their scores are weighted towards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = refresh(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {counts['top']} top, {counts['tag']} per tag and "
+                f"{counts['trending']} trending entries "
+                f"in {time.perf_counter() - started:.2f}s."
+            )
+        )
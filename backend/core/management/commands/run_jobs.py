@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.checks import SHARED_CACHE_HINT, uses_shared_cache
+from core.jobs import STALE_AFTER, claim, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs, such as catalog syncs and aggregate "
+        "rebuilds. Start as many workers as needed; each job runs once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for new jobs.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls of an empty queue.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=float,
+            default=STALE_AFTER.total_seconds(),
+            help="Seconds without a heartbeat before a running job is reclaimed.",
+        )
+
+    def handle(self, *args, **options):
+        # Jobs invalidate cached pages and indexes by bumping versions in the
+        # cache, which the web processes only see if they share it.
+        if not uses_shared_cache():
+            raise CommandError(
+                "run_jobs needs a cache shared with the web processes. "
+                + SHARED_CACHE_HINT
+            )
+
+        worker = worker_name()
+        stale_after = timedelta(seconds=options["stale_after"])
+        self.stdout.write(f"worker {worker} started")
+
+        while True:
+            close_old_connections()
+            job = claim(worker, stale_after)
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"running {job}, attempt {job.attempts}")
+            started = time.perf_counter()
+            run_job(job, worker)
+            self.stdout.write(
+                f"finished {job} in {time.perf_counter() - started:.2f}s"
+            )
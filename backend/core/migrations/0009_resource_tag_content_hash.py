@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_alter_userrating_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='is_stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
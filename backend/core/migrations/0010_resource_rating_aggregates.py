@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:53
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Resource = apps.get_model("core", "Resource")
+    UserRating = apps.get_model("core", "UserRating")
+
+    stats = (
+        UserRating.objects.order_by()
+        .values("resource_id")
+        .annotate(total=Sum("rating"), count=Count("pk"))
+    )
+    resources = [
+        Resource(
+            pk=row["resource_id"],
+            rating_sum=row["total"],
+            rating_count=row["count"],
+            rating_avg=row["total"] / row["count"],
+        )
+        for row in stats.iterator()
+    ]
+    Resource.objects.bulk_update(
+        resources, ["rating_sum", "rating_count", "rating_avg"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_resource_tag_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='rating_avg',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:58
+
+import re
+
+from django.db import migrations, models
+
+
+TOKEN = re.compile(r"[^\W_]+")
+
+
+def backfill_search_documents(apps, schema_editor):
+    Resource = apps.get_model("core", "Resource")
+    ResourceTag = Resource.tags.through
+
+    tag_names = {}
+    for resource_id, name in ResourceTag.objects.values_list("resource_id", "tag__tag"):
+        tag_names.setdefault(resource_id, []).append(name)
+
+    resources = []
+    for pk, name, author in Resource.objects.values_list("pk", "name", "author"):
+        text = " ".join([name, author, *tag_names.get(pk, ())]).lower()
+        resources.append(
+            Resource(pk=pk, search_document=" ".join(TOKEN.findall(text)))
+        )
+    Resource.objects.bulk_update(resources, ["search_document"], batch_size=1000)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX core_resource_search_document_fts ON core_resource "
+            "USING GIN (to_tsvector('simple', search_document))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS core_resource_search_document_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_resource_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='search_document',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
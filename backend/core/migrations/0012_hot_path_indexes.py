@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def clamp_out_of_range_ratings(apps, schema_editor):
+    # Ratings used to be stored unchecked; bring them into the range the
+    # constraint below enforces and recompute the aggregates.
+    Resource = apps.get_model("core", "Resource")
+    UserRating = apps.get_model("core", "UserRating")
+
+    if not UserRating.objects.filter(Q(rating__lt=1) | Q(rating__gt=5)).exists():
+        return
+
+    UserRating.objects.filter(rating__lt=1).update(rating=1)
+    UserRating.objects.filter(rating__gt=5).update(rating=5)
+
+    stats = (
+        UserRating.objects.order_by()
+        .values("resource_id")
+        .annotate(total=Sum("rating"), count=Count("pk"))
+    )
+    resources = [
+        Resource(
+            pk=row["resource_id"],
+            rating_sum=row["total"],
+            rating_count=row["count"],
+            rating_avg=row["total"] / row["count"],
+        )
+        for row in stats.iterator()
+    ]
+    Resource.objects.bulk_update(
+        resources, ["rating_sum", "rating_count", "rating_avg"], batch_size=1000
+    )
+
+
+def create_newest_index(apps, schema_editor):
+    # Serves both keyset orderings: descending with nulls last, and read
+    # backwards, ascending with nulls first. SQLite and MySQL treat nulls as
+    # the smallest value, which gives that order without a NULLS clause
+    # (neither accepts one in an index).
+    nulls = " NULLS LAST" if schema_editor.connection.vendor == "postgresql" else ""
+    schema_editor.execute(
+        "CREATE INDEX core_resource_newest_idx ON core_resource "
+        f"(created_at DESC{nulls}, id DESC)"
+    )
+
+
+def drop_newest_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute("DROP INDEX core_resource_newest_idx ON core_resource")
+    else:
+        schema_editor.execute("DROP INDEX core_resource_newest_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_resource_search_document'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resource',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['rating_avg', 'id'], name='core_resource_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrating',
+            index=models.Index(fields=['resource', 'rating'], name='core_userrating_res_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersavedresource',
+            index=models.Index(condition=models.Q(('is_saved', True)), fields=['user', 'id'], name='core_saved_user_saved_idx'),
+        ),
+        migrations.RunPython(create_newest_index, drop_newest_index),
+        migrations.RunPython(clamp_out_of_range_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userrating',
+            constraint=models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='core_userrating_rating_range'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_pending_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=50)),
+                ('score', models.FloatField()),
+                ('rating_avg', models.FloatField()),
+                ('rating_count', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'Leaderboard entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userrating',
+            index=models.Index(fields=['created_at'], name='core_userrating_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='resource',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.resource'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['board', '-score', 'resource'], name='core_leaderboard_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('board', 'resource'), name='core_leaderboard_resource_uniq'),
+        ),
+    ]
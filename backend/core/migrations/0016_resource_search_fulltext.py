@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:20
+
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX core_resource_search_document_ft "
+            "ON core_resource (search_document)"
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "DROP INDEX core_resource_search_document_ft ON core_resource"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_leaderboards'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
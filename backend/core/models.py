@@ -6,7 +6,20 @@ from django.contrib.auth.models import (
 )
 from backend.settings import AUTH_USER_MODEL
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce
 
 
 class CustomUserManager(BaseUserManager):
@@ -54,11 +67,70 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 class Tag(models.Model):
     external_id = models.CharField(max_length=255, unique=True)
     tag = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
 
     def __str__(self):
         return f"{self.tag}"
 
 
+class ResourceQuerySet(models.QuerySet):
+    def apply_rating_delta(self, sum_delta, count_delta=0):
+        self.update(
+            rating_sum=F("rating_sum") + sum_delta,
+            rating_count=F("rating_count") + count_delta,
+        )
+        return self.refresh_rating_avg()
+
+    def apply_rating_deltas(self, deltas):
+        """
+        Apply ``{pk: (sum_delta, count_delta)}`` to the rows in ``deltas``
+        with a single UPDATE.
+        """
+        if not deltas:
+            return 0
+
+        def per_row(index):
+            return Case(
+                *[
+                    When(pk=pk, then=Value(delta[index]))
+                    for pk, delta in deltas.items()
+                ],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+
+        self.filter(pk__in=list(deltas)).update(
+            rating_sum=F("rating_sum") + per_row(0),
+            rating_count=F("rating_count") + per_row(1),
+        )
+        return self.filter(pk__in=list(deltas)).refresh_rating_avg()
+
+    def rebuild_rating_stats(self):
+        ratings = (
+            UserRating.objects.filter(resource=OuterRef("pk"))
+            .order_by()
+            .values("resource")
+        )
+        self.update(
+            rating_sum=Coalesce(
+                Subquery(ratings.annotate(total=Sum("rating")).values("total")), 0
+            ),
+            rating_count=Coalesce(
+                Subquery(ratings.annotate(total=Count("pk")).values("total")), 0
+            ),
+        )
+        return self.refresh_rating_avg()
+
+    def refresh_rating_avg(self):
+        return self.update(
+            rating_avg=Case(
+                When(rating_count=0, then=Value(0.0)),
+                default=Cast("rating_sum", FloatField()) / F("rating_count"),
+                output_field=FloatField(),
+            )
+        )
+
+
 class Resource(models.Model):
     external_id = models.CharField(max_length=255, unique=True)
     author = models.CharField(max_length=255)
@@ -66,17 +138,32 @@ class Resource(models.Model):
     url = models.URLField(max_length=1500)
     created_at = models.DateTimeField(null=True, blank=True)
     tags = models.ManyToManyField(Tag, related_name="resources")
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    is_stale = models.BooleanField(default=False)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0)
+    search_document = models.TextField(blank=True, default="")
+
+    objects = ResourceQuerySet.as_manager()
+
+    class Meta:
+        # The created_at keyset index needs NULLS LAST on PostgreSQL and is
+        # created by migration 0012 directly.
+        indexes = [
+            models.Index(fields=["rating_avg", "id"], name="core_resource_rating_idx"),
+        ]
 
     def __str__(self):
         return f"{self.author} - {self.name}"
     
     @property
     def avg_rating(self):
-        return self.userrating_set.aggregate(avg=Avg('rating'))["avg"] or 0
+        return self.rating_avg if self.rating_count else 0
     
     @property
     def ratings_count(self):
-        return self.userrating_set.count()
+        return self.rating_count
     
 
 
@@ -94,10 +181,93 @@ class UserRating(models.Model):
         unique_together = ("user", "resource")
         verbose_name = "User Rating"
         verbose_name_plural = "User Ratings"
+        indexes = [
+            models.Index(
+                fields=["resource", "rating"], name="core_userrating_res_rating_idx"
+            ),
+            # The trending leaderboard's window scan.
+            models.Index(fields=["created_at"], name="core_userrating_created_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(rating__gte=1, rating__lte=5),
+                name="core_userrating_rating_range",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.resource} - {self.rating}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored rating so the aggregate signal handlers can
+        # apply the difference when the row is saved again.
+        instance._stored_rating = instance.__dict__.get("rating")
+        return instance
+
+
+class PendingRating(models.Model):
+    """
+    A rating accepted in write-behind mode and not yet applied to
+    ``UserRating``. Rows are only ever inserted, then removed by
+    ``core.rating_buffer.flush``; for each user and resource the row with
+    the highest id wins.
+    """
+
+    user = models.ForeignKey(AUTH_USER_MODEL, on_delete=models.CASCADE)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE)
+    rating = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "resource"], name="core_pendingrating_user_idx"
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(rating__gte=1, rating__lte=5),
+                name="core_pendingrating_rating_range",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.resource} - {self.rating} (pending)"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A resource's score on one precomputed leaderboard, maintained by
+    ``core.leaderboards``. ``board`` is "top", "trending" or "tag:<tag id>".
+    """
+
+    board = models.CharField(max_length=50)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rating_avg = models.FloatField()
+    rating_count = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name_plural = "Leaderboard entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["board", "resource"], name="core_leaderboard_resource_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["board", "-score", "resource"],
+                name="core_leaderboard_rank_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.board}: {self.resource} ({self.score:.2f})"
+
 
 class UserSavedResource(models.Model):
     user = models.ForeignKey(AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -108,6 +278,53 @@ class UserSavedResource(models.Model):
         unique_together = ("user", "resource")
         verbose_name = "User Saved Resource"
         verbose_name_plural = "User Saved Resources"
+        indexes = [
+            models.Index(
+                fields=["user", "id"],
+                condition=Q(is_saved=True),
+                name="core_saved_user_saved_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} saved {self.resource} ({'Yes' if self.is_saved else 'No'})"
+
+
+class Job(models.Model):
+    """A unit of background work, run by the ``run_jobs`` worker."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    payload = models.JSONField(default=dict, blank=True)
+    # Handler state saved after every batch, so a reclaimed job resumes
+    # where the previous worker stopped.
+    cursor = models.JSONField(default=dict, blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="core_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,141 @@
+"""
+Write-behind buffering of rating submissions, enabled with
+``RATING_WRITE_BEHIND``.
+
+Submitting a rating is a single INSERT into ``PendingRating``. There is no
+read of the stored rating, no row lock and no aggregate update, so a burst
+of ratings on a popular resource does not queue up on its row. ``flush``
+(run by the ``flush_ratings`` command) takes the oldest pending rows and
+keeps the last rating per user and resource. In one transaction it
+upserts those ratings into ``UserRating`` with one statement and applies
+the aggregate deltas with another. The buffer is a table, so accepted
+ratings survive a restart until the next flush.
+
+Until the flush, ``pending_ratings`` lets a user see the ratings they
+submitted. The aggregates, and everyone else, catch up when the flush
+commits.
+"""
+
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from .catalog import invalidate, saved_resources
+from .leaderboards import update_on_commit as update_leaderboards
+from .models import PendingRating, Resource, UserRating
+from .utils import upsert
+
+
+@dataclass
+class FlushCounts:
+    pending: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def add(self, other):
+        for name, count in asdict(other).items():
+            setattr(self, name, getattr(self, name) + count)
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def submit(user_id, ratings):
+    """Buffer ``{resource id: rating}`` for ``user_id``."""
+    PendingRating.objects.bulk_create(
+        [
+            PendingRating(user_id=user_id, resource_id=resource_id, rating=rating)
+            for resource_id, rating in ratings.items()
+        ]
+    )
+    # The user's pages show their own ratings; see ``pending_ratings``.
+    invalidate(saved_resources(user_id))
+
+
+def pending_ratings(user_id, resource_ids):
+    """``{resource id: rating}`` of the ratings ``user_id`` has in the buffer."""
+    return dict(
+        PendingRating.objects.filter(user_id=user_id, resource_id__in=resource_ids)
+        .order_by("pk")
+        .values_list("resource_id", "rating")
+    )
+
+
+def flush(batch_size=None):
+    """Apply the oldest ``batch_size`` pending ratings."""
+    batch_size = batch_size or settings.RATING_FLUSH_BATCH_SIZE
+    counts = FlushCounts()
+
+    with transaction.atomic():
+        # Locked so that concurrent flushes never apply a row twice.
+        rows = list(
+            PendingRating.objects.select_for_update()
+            .order_by("pk")
+            .values_list("pk", "user_id", "resource_id", "rating")[:batch_size]
+        )
+        if not rows:
+            return counts
+        counts.pending = len(rows)
+
+        latest = {}
+        for _, user_id, resource_id, rating in rows:
+            latest[user_id, resource_id] = rating
+
+        stored = {
+            (user_id, resource_id): rating
+            for user_id, resource_id, rating in UserRating.objects.select_for_update()
+            .filter(
+                user_id__in={user_id for user_id, _ in latest},
+                resource_id__in={resource_id for _, resource_id in latest},
+            )
+            .values_list("user_id", "resource_id", "rating")
+            if (user_id, resource_id) in latest
+        }
+
+        to_write = []
+        deltas = {}
+        for (user_id, resource_id), rating in latest.items():
+            current = stored.get((user_id, resource_id))
+            if current == rating:
+                counts.unchanged += 1
+                continue
+
+            to_write.append(
+                UserRating(user_id=user_id, resource_id=resource_id, rating=rating)
+            )
+            sum_delta, count_delta = deltas.get(resource_id, (0, 0))
+            if current is None:
+                deltas[resource_id] = (sum_delta + rating, count_delta + 1)
+                counts.created += 1
+            else:
+                deltas[resource_id] = (sum_delta + rating - current, count_delta)
+                counts.updated += 1
+
+        # Bulk writes skip the signals that keep the aggregates up to date.
+        if to_write:
+            upsert(
+                UserRating,
+                to_write,
+                unique_fields=["user", "resource"],
+                update_fields=["rating"],
+                batch_size=batch_size,
+            )
+            Resource.objects.apply_rating_deltas(deltas)
+            invalidate()
+            update_leaderboards(deltas)
+
+        PendingRating.objects.filter(pk__in=[row[0] for row in rows]).delete()
+
+    return counts
+
+
+def flush_all(batch_size=None):
+    """Flush batches until the buffer is empty."""
+    counts = FlushCounts()
+    while True:
+        batch = flush(batch_size)
+        if not batch.pending:
+            return counts
+        counts.add(batch)
@@ -0,0 +1,253 @@
+"""
+Full-text search over resources.
+
+Each resource keeps a ``search_document`` (its name, author and tag names,
+lowercased) that the ingest path and the model signals keep current. On
+PostgreSQL the documents are matched with ``to_tsquery`` against a GIN
+expression index created by migration 0011; on MySQL with ``MATCH ...
+AGAINST`` in boolean mode against the FULLTEXT index of migration 0016.
+Other databases (SQLite) fall back to an in-process inverted index that
+is updated incrementally after each ingest and rebuilt whenever another
+process has changed the documents.
+
+Every query term is matched as a prefix and all terms must match.
+Results are ranked with ``ts_rank`` on PostgreSQL, by MATCH relevance on
+MySQL, and with an idf weighted score that favours whole-word matches
+otherwise. MySQL does not index words on its stopword list, so turn
+``innodb_ft_enable_stopword`` off for those to be searchable.
+"""
+
+import bisect
+import math
+import re
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .catalog import LocalIndex
+from .models import Resource
+from .utils import chunked
+
+
+SEARCH = "search"
+
+TOKEN = re.compile(r"[^\W_]+")
+
+DOCUMENT_VECTOR = "to_tsvector('simple', search_document)"
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def build_document(name, author, tag_names=()):
+    return " ".join(tokenize(" ".join([name, author, *tag_names])))
+
+
+def refresh_documents(resource_ids, batch_size=1000):
+    """Rebuild the stored documents of the given resources."""
+    ResourceTag = Resource.tags.through
+
+    for batch in chunked(resource_ids, batch_size):
+        tag_names = {}
+        for resource_id, name in ResourceTag.objects.filter(
+            resource_id__in=batch
+        ).values_list("resource_id", "tag__tag"):
+            tag_names.setdefault(resource_id, []).append(name)
+
+        resources = [
+            Resource(
+                pk=pk,
+                search_document=build_document(name, author, tag_names.get(pk, ())),
+            )
+            for pk, name, author in Resource.objects.filter(pk__in=batch).values_list(
+                "pk", "name", "author"
+            )
+        ]
+        Resource.objects.bulk_update(resources, ["search_document"])
+
+    transaction.on_commit(lambda: search_index.refresh(resource_ids))
+
+
+def refresh_tag_documents(tag_ids):
+    resource_ids = set(
+        Resource.tags.through.objects.filter(tag_id__in=tag_ids).values_list(
+            "resource_id", flat=True
+        )
+    )
+    refresh_documents(resource_ids)
+
+
+def uses_database_search():
+    return connection.vendor in ("postgresql", "mysql")
+
+
+def search(query):
+    """
+    Return the ids of the resources matching ``query``, best match first.
+
+    The result is a list on the fallback path and a lazy queryset on
+    PostgreSQL and MySQL; both can be counted and sliced by a paginator.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    if connection.vendor == "mysql":
+        return _fulltext_search(terms)
+    if uses_database_search():
+        return _database_search(terms)
+    return search_index.search(terms)
+
+
+def boolean_query(terms):
+    """A MySQL boolean mode query requiring every term as a prefix."""
+    return " ".join(f"+{term}*" for term in terms)
+
+
+def _fulltext_search(terms):
+    match = "MATCH (search_document) AGAINST (%s IN BOOLEAN MODE)"
+    query = boolean_query(terms)
+    return (
+        Resource.objects.filter(RawSQL(match, [query], output_field=BooleanField()))
+        .annotate(rank=RawSQL(match, [query], output_field=FloatField()))
+        .order_by("-rank", "id")
+        .values_list("id", flat=True)
+    )
+
+
+def _database_search(terms):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    return (
+        Resource.objects.filter(
+            RawSQL(
+                f"{DOCUMENT_VECTOR} @@ to_tsquery('simple', %s)",
+                [tsquery],
+                output_field=BooleanField(),
+            )
+        )
+        .annotate(
+            rank=RawSQL(
+                f"ts_rank({DOCUMENT_VECTOR}, to_tsquery('simple', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-rank", "id")
+        .values_list("id", flat=True)
+    )
+
+
+class InvertedIndex(LocalIndex):
+    """
+    Token -> resource id postings with a sorted token list for prefix
+    lookups. Safe to share between threads.
+    """
+
+    version_name = SEARCH
+
+    EXACT_WEIGHT = 2.0
+    PREFIX_WEIGHT = 1.0
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def _clear(self):
+        self.postings = {}
+        self.tokens = []
+        self.documents = {}
+
+    def build(self):
+        self._clear()
+        documents = Resource.objects.values_list("pk", "search_document")
+        for pk, document in documents.iterator(chunk_size=5000):
+            self._add(pk, document)
+        self.tokens = sorted(self.postings)
+
+    def refresh(self, resource_ids):
+        if not uses_database_search():
+            super().refresh(resource_ids)
+
+    def update(self, resource_ids):
+        for batch in chunked(resource_ids, 5000):
+            documents = dict(
+                Resource.objects.filter(pk__in=batch).values_list(
+                    "pk", "search_document"
+                )
+            )
+            for pk in batch:
+                self._remove(pk)
+                if pk in documents:
+                    self._add(pk, documents[pk], insort=True)
+
+    def search(self, terms):
+        with self._lock:
+            self.ensure_current()
+
+            matches = sorted(
+                (self._match(term) for term in set(terms)),
+                key=lambda match: sum(len(postings) for _, postings in match),
+            )
+
+            # Score the rarest term first, then only narrow its candidates.
+            scores = {}
+            for weight, postings in matches[0]:
+                for pk in postings:
+                    if scores.get(pk, 0) < weight:
+                        scores[pk] = weight
+            for match in matches[1:]:
+                best = {}
+                if len(scores) * len(match) <= sum(len(p) for _, p in match):
+                    for pk in scores:
+                        for weight, postings in match:
+                            if pk in postings and best.get(pk, 0) < weight:
+                                best[pk] = weight
+                else:
+                    for weight, postings in match:
+                        for pk in postings:
+                            if pk in scores and best.get(pk, 0) < weight:
+                                best[pk] = weight
+                scores = {pk: scores[pk] + weight for pk, weight in best.items()}
+
+        return sorted(scores, key=lambda pk: (-scores[pk], pk))
+
+    def _match(self, term):
+        """(weight, postings) for every indexed token starting with ``term``."""
+        total = max(len(self.documents), 1)
+        match = []
+        index = bisect.bisect_left(self.tokens, term)
+        while index < len(self.tokens) and self.tokens[index].startswith(term):
+            token = self.tokens[index]
+            index += 1
+            postings = self.postings.get(token)
+            if postings:
+                weight = self.EXACT_WEIGHT if token == term else self.PREFIX_WEIGHT
+                weight *= math.log(1 + total / len(postings))
+                match.append((weight, postings))
+        return match
+
+    def _add(self, pk, document, insort=False):
+        tokens = set(document.split())
+        self.documents[pk] = tokens
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = set()
+                if insort:
+                    bisect.insort(self.tokens, token)
+            postings.add(pk)
+
+    def _remove(self, pk):
+        for token in self.documents.pop(pk, ()):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.discard(pk)
+                if not postings:
+                    del self.postings[token]
+                    index = bisect.bisect_left(self.tokens, token)
+                    if index < len(self.tokens) and self.tokens[index] == token:
+                        del self.tokens[index]
+
+
+search_index = InvertedIndex()
@@ -0,0 +1,128 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .auth_backends import mark_user_active, mark_user_inactive
+from .blacklist import blacklist_filter
+from .catalog import invalidate, saved_resources
+from .leaderboards import update_on_commit as update_leaderboards
+from .models import CustomUser, Resource, Tag, UserRating, UserSavedResource
+from .search import refresh_documents, refresh_tag_documents, search_index
+from .tag_index import tag_index
+
+
+@receiver(post_save, sender=UserRating)
+def apply_rating_to_resource(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    resources = Resource.objects.filter(pk=instance.resource_id)
+    stored_rating = getattr(instance, "_stored_rating", None)
+
+    if created:
+        resources.apply_rating_delta(instance.rating, 1)
+    elif stored_rating is None:
+        resources.rebuild_rating_stats()
+    elif stored_rating != instance.rating:
+        resources.apply_rating_delta(instance.rating - stored_rating)
+
+    instance._stored_rating = instance.rating
+    invalidate()
+    update_leaderboards([instance.resource_id])
+
+
+@receiver(post_delete, sender=UserRating)
+def remove_rating_from_resource(sender, instance, **kwargs):
+    rating = getattr(instance, "_stored_rating", None) or instance.rating
+    Resource.objects.filter(pk=instance.resource_id).apply_rating_delta(-rating, -1)
+    invalidate()
+    update_leaderboards([instance.resource_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(m2m_changed, sender=Resource.tags.through)
+def invalidate_catalog(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate()
+
+
+@receiver(post_save, sender=Resource)
+def refresh_resource_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_documents([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tagged_documents(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        refresh_tag_documents([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def refresh_tag_names(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: tag_index.refresh([]))
+
+
+@receiver(m2m_changed, sender=Resource.tags.through)
+def refresh_retagged_resources(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        resource_ids = [instance.pk]
+    elif action == "pre_clear":
+        # ``tag.resources.clear()`` does not report which resources lost the tag.
+        instance._cleared_resource_ids = set(
+            instance.resources.values_list("pk", flat=True)
+        )
+        return
+    elif action == "post_clear":
+        resource_ids = instance.__dict__.pop("_cleared_resource_ids", set())
+    else:
+        resource_ids = pk_set
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        refresh_documents(resource_ids)
+        transaction.on_commit(lambda: tag_index.refresh(resource_ids))
+
+
+@receiver(post_delete, sender=Resource)
+def drop_resource_document(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search_index.refresh([pk]))
+    transaction.on_commit(lambda: tag_index.refresh([pk]))
+
+
+@receiver(post_save, sender=UserSavedResource)
+@receiver(post_delete, sender=UserSavedResource)
+def invalidate_saved_resources(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate(saved_resources(instance.user_id))
+
+
+@receiver(post_save, sender=CustomUser)
+def track_user_activation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.is_active:
+        mark_user_active(instance.pk)
+    else:
+        mark_user_inactive(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def reject_deleted_user(sender, instance, **kwargs):
+    mark_user_inactive(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def refresh_blacklist_filter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Now, so that later checks in this transaction see the token, and
+        # again after commit for processes that reloaded before it was
+        # visible to them.
+        blacklist_filter.refresh(())
+        transaction.on_commit(lambda: blacklist_filter.refresh(()))
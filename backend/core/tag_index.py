@@ -0,0 +1,129 @@
+"""
+In-process tag -> resource id index for filtering the catalog by tag.
+
+For every tag the index holds the sorted ids of the resources carrying it
+(``array('q')``, 8 bytes per link), built from the ``Resource.tags``
+through table. Multi-tag filters are answered with set operations on
+these arrays instead of one join per tag. The index follows the
+``LocalIndex`` protocol: the ingest path and the model signals call
+``refresh`` with the resources whose tags changed.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left, insort
+
+from .catalog import LocalIndex
+from .models import Resource, Tag
+from .utils import chunked
+
+
+TAGS = "tags"
+
+ResourceTag = Resource.tags.through
+
+
+class TagIndex(LocalIndex):
+    version_name = TAGS
+
+    def __init__(self):
+        super().__init__()
+        self.resources_by_tag = {}
+        self.tags_by_resource = {}
+        self.tag_ids_by_name = {}
+
+    def build(self):
+        resources_by_tag = {}
+        tags_by_resource = {}
+        links = ResourceTag.objects.order_by("resource_id").values_list(
+            "tag_id", "resource_id"
+        )
+        for tag_id, resource_id in links.iterator(chunk_size=10000):
+            resources_by_tag.setdefault(tag_id, array("q")).append(resource_id)
+            tags_by_resource.setdefault(resource_id, set()).add(tag_id)
+
+        self.resources_by_tag = resources_by_tag
+        self.tags_by_resource = tags_by_resource
+        self._load_tag_names()
+
+    def update(self, resource_ids):
+        for batch in chunked(resource_ids, 5000):
+            current = {}
+            for resource_id, tag_id in ResourceTag.objects.filter(
+                resource_id__in=batch
+            ).values_list("resource_id", "tag_id"):
+                current.setdefault(resource_id, set()).add(tag_id)
+
+            for resource_id in batch:
+                previous = self.tags_by_resource.pop(resource_id, set())
+                tags = current.get(resource_id, set())
+                for tag_id in previous - tags:
+                    self._discard(tag_id, resource_id)
+                for tag_id in tags - previous:
+                    insort(
+                        self.resources_by_tag.setdefault(tag_id, array("q")),
+                        resource_id,
+                    )
+                if tags:
+                    self.tags_by_resource[resource_id] = tags
+
+        self._load_tag_names()
+
+    def filter(self, names, match_all=True):
+        """Sorted ids of the resources tagged with all (or any) of ``names``."""
+        with self._lock:
+            self.ensure_current()
+
+            groups = []
+            for name in names:
+                resource_ids = [
+                    self.resources_by_tag.get(tag_id, ())
+                    for tag_id in self.tag_ids_by_name.get(name, ())
+                ]
+                if len(resource_ids) == 1:
+                    groups.append(resource_ids[0])
+                elif resource_ids:
+                    groups.append(_union(resource_ids))
+                elif match_all:
+                    return []
+
+            if not groups:
+                return []
+            if not match_all:
+                return _union(groups)
+
+            if len(groups) == 1:
+                return list(groups[0])
+
+            groups.sort(key=len)
+            matched = set(groups[0])
+            for group in groups[1:]:
+                matched.intersection_update(group)
+                if not matched:
+                    return []
+            return sorted(matched)
+
+    def _discard(self, tag_id, resource_id):
+        resource_ids = self.resources_by_tag.get(tag_id)
+        if resource_ids is None:
+            return
+        index = bisect_left(resource_ids, resource_id)
+        if index < len(resource_ids) and resource_ids[index] == resource_id:
+            del resource_ids[index]
+
+    def _load_tag_names(self):
+        tag_ids_by_name = {}
+        for pk, name in Tag.objects.values_list("pk", "tag"):
+            tag_ids_by_name.setdefault(name, []).append(pk)
+        self.tag_ids_by_name = tag_ids_by_name
+
+
+def _union(sorted_groups):
+    merged = []
+    for resource_id in heapq.merge(*sorted_groups):
+        if not merged or merged[-1] != resource_id:
+            merged.append(resource_id)
+    return merged
+
+
+tag_index = TagIndex()
@@ -1,3 +1,1677 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import rsa
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Prefetch
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from google.auth import crypt, jwt
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from api.metrics import request_metrics
+from api.pagination import KeysetPagination
+from api.middleware import QueryBudgetExceeded
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+from api.serializers import ResourceRowSerializer, ResourceSerializer
+from api.views import ResourcesListAPIView
+
+from .blacklist import BlacklistFilter, blacklist_filter
+from .checks import (
+    check_blacklist_filter_cache,
+    check_shared_cache,
+    check_stateless_user_cache,
+)
+from .google_auth import CachedRequest, verify_google_id_token
+from .ingest import CatalogIngest, ingest_catalog
+from .jsonstream import iter_json_array
+from .jobs import JobLost, JobRun, claim, enqueue
+from .models import (
+    CustomUser,
+    Job,
+    LeaderboardEntry,
+    PendingRating,
+    Resource,
+    Tag,
+    UserRating,
+    UserSavedResource,
+)
+from .rating_buffer import flush
+from .search import search, search_index
+from .tag_index import tag_index
+from .tokens import AccessToken, RefreshToken
+
+
+def create_resources(count, start=0, tags=(), raters=()):
+    resources = []
+    for i in range(start, start + count):
+        resource = Resource.objects.create(
+            external_id=f"res-{i}",
+            author=f"Author {i}",
+            name=f"Resource {i}",
+            url=f"https://example.com/{i}",
+        )
+        resource.tags.set(tags)
+        for rating, user in enumerate(raters, start=1):
+            UserRating.objects.create(user=user, resource=resource, rating=rating)
+        resources.append(resource)
+    return resources
+
+
+LOCAL_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+SHARED_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "backend-test-cache"),
+    }
+}
+
+
+class SharedCacheMixin:
+    """Gives every test its own file cache, which the workers require."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared_cache = override_settings(
+            CACHES={"default": dict(SHARED_CACHE["default"], LOCATION=directory.name)}
+        )
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+
+
+class ResourceListQueryCountTests(APITestCase):
+    def setUp(self):
+        self.tags = [
+            Tag.objects.create(external_id=f"tag-{i}", tag=f"Tag {i}") for i in range(3)
+        ]
+        self.users = [
+            CustomUser.objects.create_user(f"user{i}@example.com", f"user{i}")
+            for i in range(2)
+        ]
+
+    def list_resources(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/resources/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        create_resources(2, tags=self.tags, raters=self.users)
+        _, small_page_queries = self.list_resources()
+
+        create_resources(40, start=2, tags=self.tags, raters=self.users)
+        response, large_page_queries = self.list_resources()
+
+        self.assertEqual(len(response.data["results"]), 42)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_rating_stats_and_tags(self):
+        create_resources(1, tags=self.tags, raters=self.users)
+        create_resources(1, start=1)
+
+        response, _ = self.list_resources()
+
+        rated, unrated = response.data["results"]
+        self.assertEqual(rated["avg_rating"], 1.5)
+        self.assertEqual(rated["ratings_count"], 2)
+        self.assertEqual(sorted(rated["tags"]), ["Tag 0", "Tag 1", "Tag 2"])
+        self.assertEqual(unrated["avg_rating"], 0)
+        self.assertEqual(unrated["ratings_count"], 0)
+        self.assertEqual(unrated["tags"], [])
+
+
+class SavedResourcesTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+        self.tags = [Tag.objects.create(external_id="t1", tag="Python")]
+        self.client.force_authenticate(self.user)
+
+    def save(self, resources, is_saved=True):
+        UserSavedResource.objects.bulk_create(
+            UserSavedResource(user=self.user, resource=resource, is_saved=is_saved)
+            for resource in resources
+        )
+
+    def list_saved(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/resources/saved/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_saved_items(self):
+        self.save(create_resources(2, tags=self.tags, raters=[self.user]))
+        _, few_queries = self.list_saved()
+
+        self.save(create_resources(30, start=2, tags=self.tags, raters=[self.user]))
+        self.save(create_resources(3, start=32), is_saved=False)
+        response, many_queries = self.list_saved()
+
+        self.assertEqual(response.data["count"], 32)
+        self.assertEqual(
+            [item["external_id"] for item in response.data["results"][:2]],
+            ["res-0", "res-1"],
+        )
+        self.assertEqual(response.data["results"][0]["tags"], ["Python"])
+        self.assertEqual(few_queries, many_queries)
+
+
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        self.resource = create_resources(1)[0]
+        self.users = [
+            CustomUser.objects.create_user(f"user{i}@example.com", f"user{i}")
+            for i in range(2)
+        ]
+
+    def rate(self, user, rating):
+        self.client.force_authenticate(user)
+        response = self.client.post(
+            f"/api/resources/rate/{self.resource.pk}/", {"rating": rating}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def assertAggregates(self, rating_sum, rating_count):
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.rating_sum, rating_sum)
+        self.assertEqual(self.resource.rating_count, rating_count)
+        self.assertEqual(
+            self.resource.avg_rating, rating_sum / rating_count if rating_count else 0
+        )
+
+    def test_create_update_and_cascade_delete(self):
+        self.rate(self.users[0], 4)
+        self.rate(self.users[1], 2)
+        self.assertAggregates(6, 2)
+
+        self.rate(self.users[0], 5)
+        self.assertAggregates(7, 2)
+
+        self.users[1].delete()
+        self.assertAggregates(5, 1)
+
+        call_command("rebuild_rating_aggregates", "--verify", stdout=StringIO())
+
+    def test_rejects_out_of_range_rating(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(
+            f"/api/resources/rate/{self.resource.pk}/", {"rating": 9}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertAggregates(0, 0)
+
+    def test_rebuild_repairs_drift(self):
+        UserRating.objects.create(user=self.users[0], resource=self.resource, rating=3)
+        Resource.objects.filter(pk=self.resource.pk).update(rating_sum=0, rating_count=0)
+
+        self.assertEqual(self.client.get("/api/resources/")["X-Cache"], "MISS")
+
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+
+        self.assertAggregates(3, 1)
+        response = self.client.get("/api/resources/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["avg_rating"], 3)
+
+
+class RatingRangeMigrationTests(TransactionTestCase):
+    before = [("core", "0011_resource_search_document")]
+    after = [("core", "0012_hot_path_indexes")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_out_of_range_ratings_are_clamped(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        User = apps.get_model("core", "CustomUser")
+        Resource = apps.get_model("core", "Resource")
+        UserRating = apps.get_model("core", "UserRating")
+
+        resource = Resource.objects.create(
+            external_id="r", name="R", url="https://a.io"
+        )
+        for i, rating in enumerate([9, 0, 4]):
+            user = User.objects.create(email=f"user{i}@example.com", username=f"u{i}")
+            UserRating.objects.create(user=user, resource=resource, rating=rating)
+
+        MigrationExecutor(connection).migrate(self.after)
+
+        self.assertEqual(
+            sorted(UserRating.objects.values_list("rating", flat=True)), [1, 4, 5]
+        )
+        resource = Resource.objects.get()
+        self.assertEqual((resource.rating_sum, resource.rating_count), (10, 3))
+
+
+class ResourceBatchTests(APITestCase):
+    def setUp(self):
+        self.resources = create_resources(3)
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+        self.client.force_authenticate(self.user)
+
+    def batch(self, operations):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/resources/batch/", {"operations": operations}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"], len(queries)
+
+    def test_applies_operations_in_one_request(self):
+        first, second, third = (resource.pk for resource in self.resources)
+        UserRating.objects.create(user=self.user, resource=self.resources[0], rating=2)
+
+        results, queries = self.batch(
+            [
+                {"op": "save", "resource": first},
+                {"op": "save", "resource": second},
+                {"op": "unsave", "resource": second},
+                {"op": "rate", "resource": first, "rating": 5},
+                {"op": "rate", "resource": third, "rating": 3},
+                {"op": "rate", "resource": third, "rating": 9},
+                {"op": "save", "resource": 999},
+            ]
+        )
+
+        self.assertEqual(
+            [result["status"] for result in results], ["ok"] * 5 + ["error"] * 2
+        )
+        self.assertEqual(
+            list(
+                UserSavedResource.objects.filter(user=self.user).values_list(
+                    "resource_id", flat=True
+                )
+            ),
+            [first],
+        )
+        for resource, rating_sum, rating_count in ((0, 5, 1), (2, 3, 1)):
+            self.resources[resource].refresh_from_db()
+            self.assertEqual(self.resources[resource].rating_sum, rating_sum)
+            self.assertEqual(self.resources[resource].rating_count, rating_count)
+        self.assertLess(queries, 20)
+
+        call_command("rebuild_rating_aggregates", "--verify", stdout=StringIO())
+
+    def test_saves_without_upsert_support(self):
+        first, second, _ = (resource.pk for resource in self.resources)
+        UserSavedResource.objects.create(
+            user=self.user, resource=self.resources[0], is_saved=False
+        )
+
+        with mock.patch.multiple(
+            connection.features,
+            supports_update_conflicts=False,
+            supports_update_conflicts_with_target=False,
+        ):
+            self.batch(
+                [{"op": "save", "resource": first}, {"op": "save", "resource": second}]
+            )
+
+        self.assertEqual(
+            sorted(
+                UserSavedResource.objects.filter(user=self.user).values_list(
+                    "resource_id", "is_saved"
+                )
+            ),
+            [(first, True), (second, True)],
+        )
+
+
+@override_settings(RATING_WRITE_BEHIND=True)
+class RatingWriteBehindTests(SharedCacheMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.resources = create_resources(2)
+        self.users = [
+            CustomUser.objects.create_user(f"user{i}@example.com", f"user{i}")
+            for i in range(3)
+        ]
+
+    def rate(self, user, resource, rating):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            f"/api/resources/rate/{resource.pk}/", {"rating": rating}
+        )
+
+    def my_ratings(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get("/api/resources/?include_user_state=1")
+        return [item["my_rating"] for item in response.data["results"]]
+
+    def test_buffered_rating_is_visible_to_its_author(self):
+        first, second = self.resources
+        self.assertEqual(self.my_ratings(self.users[0]), [None, None])
+
+        response = self.rate(self.users[0], first, 4)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.rate(self.users[0], first, 0).status_code, 400)
+        self.assertEqual(
+            self.client.post("/api/resources/rate/999/", {"rating": 3}).status_code,
+            404,
+        )
+        self.client.post(
+            "/api/resources/batch/",
+            {"operations": [{"op": "rate", "resource": second.pk, "rating": 2}]},
+            format="json",
+        )
+
+        self.assertFalse(UserRating.objects.exists())
+        self.assertEqual(PendingRating.objects.count(), 2)
+        self.assertEqual(self.my_ratings(self.users[0]), [4, 2])
+        self.assertEqual(self.my_ratings(self.users[1]), [None, None])
+
+        call_command("flush_ratings", stdout=StringIO())
+
+        self.assertFalse(PendingRating.objects.exists())
+        self.assertEqual(self.my_ratings(self.users[0]), [4, 2])
+        first.refresh_from_db()
+        self.assertEqual((first.rating_sum, first.rating_count), (4, 1))
+
+    def test_flush_coalesces_writes_and_applies_aggregates_once(self):
+        first, second = self.resources
+        UserRating.objects.create(user=self.users[2], resource=first, rating=4)
+        for user, resource, rating in [
+            (self.users[0], first, 2),
+            (self.users[1], first, 3),
+            (self.users[0], first, 5),
+            (self.users[2], first, 1),
+            (self.users[0], second, 3),
+            (self.users[1], second, 3),
+            (self.users[1], second, 3),
+        ]:
+            self.rate(user, resource, rating)
+
+        with CaptureQueriesContext(connection) as queries:
+            counts = flush(batch_size=5)
+        self.assertEqual(
+            counts.as_dict(),
+            {"pending": 5, "created": 3, "updated": 1, "unchanged": 0},
+        )
+        first_flush = len(queries)
+
+        # User 1's two submissions for ``second`` become one write.
+        with CaptureQueriesContext(connection) as queries:
+            counts = flush(batch_size=5)
+        self.assertEqual(
+            counts.as_dict(),
+            {"pending": 2, "created": 1, "updated": 0, "unchanged": 0},
+        )
+        self.assertEqual(len(queries), first_flush)
+
+        self.rate(self.users[1], second, 3)
+        self.assertEqual(flush().as_dict()["unchanged"], 1)
+        self.assertEqual(flush().pending, 0)
+
+        self.assertEqual(
+            sorted(
+                UserRating.objects.values_list("user__username", "resource", "rating")
+            ),
+            [
+                ("user0", first.pk, 5),
+                ("user0", second.pk, 3),
+                ("user1", first.pk, 3),
+                ("user1", second.pk, 3),
+                ("user2", first.pk, 1),
+            ],
+        )
+        call_command("rebuild_rating_aggregates", "--verify", stdout=StringIO())
+
+    def test_flush_without_upsert_support(self):
+        first, second = self.resources
+        UserRating.objects.create(user=self.users[0], resource=first, rating=4)
+        self.rate(self.users[0], first, 2)
+        self.rate(self.users[0], second, 5)
+
+        with mock.patch.multiple(
+            connection.features,
+            supports_update_conflicts=False,
+            supports_update_conflicts_with_target=False,
+        ):
+            counts = flush()
+
+        self.assertEqual((counts.created, counts.updated), (1, 1))
+        self.assertEqual(
+            sorted(UserRating.objects.values_list("resource_id", "rating")),
+            [(first.pk, 2), (second.pk, 5)],
+        )
+        call_command("rebuild_rating_aggregates", "--verify", stdout=StringIO())
+
+    def test_flush_command_refuses_process_local_cache(self):
+        with override_settings(CACHES=LOCAL_CACHE):
+            with self.assertRaisesMessage(CommandError, "shared"):
+                call_command("flush_ratings", stdout=StringIO())
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        self.tag = Tag.objects.create(external_id="t1", tag="Python")
+        self.resources = create_resources(3)
+        self.users = [
+            CustomUser.objects.create_user(f"user{i}@example.com", f"user{i}")
+            for i in range(3)
+        ]
+        first, second, third = self.resources
+        first.tags.set([self.tag])
+        third.tags.set([self.tag])
+
+        # ``first`` and ``second`` both average 5; ``second`` has more ratings.
+        ratings = [(0, first, 5), (0, second, 5), (1, second, 5), (2, second, 5)]
+        for user, resource, rating in ratings:
+            UserRating.objects.create(
+                user=self.users[user], resource=resource, rating=rating
+            )
+        old = UserRating.objects.create(user=self.users[0], resource=third, rating=1)
+        UserRating.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        call_command("refresh_leaderboards", stdout=StringIO())
+
+    def top(self, query=""):
+        response = self.client.get(f"/api/resources/top/{query}")
+        self.assertEqual(response.status_code, 200)
+        return [item["external_id"] for item in response.data["results"]]
+
+    def test_boards_rank_by_bayesian_score(self):
+        self.assertEqual(self.top(), ["res-1", "res-0", "res-2"])
+        # Every recent rating is a 5, so both score the trending mean and tie.
+        self.assertEqual(self.top("?board=trending"), ["res-0", "res-1"])
+        self.assertEqual(self.top(f"?tag={self.tag.pk}"), ["res-0", "res-2"])
+
+        entry = LeaderboardEntry.objects.get(board="top", resource=self.resources[1])
+        # 10 ratings at the mean of 4.2, plus three 5s.
+        self.assertAlmostEqual(entry.score, (10 * 4.2 + 15) / 13)
+
+        for query in ("?board=x", "?tag=x"):
+            response = self.client.get(f"/api/resources/top/{query}")
+            self.assertEqual(response.status_code, 400)
+
+    def test_rating_writes_rescore_their_resource(self):
+        third = self.resources[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                self.client.force_authenticate(user)
+                self.client.post(f"/api/resources/rate/{third.pk}/", {"rating": 5})
+
+        # Same ratings as ``second`` now; ties go to the lower id.
+        self.assertEqual(self.top(), ["res-1", "res-2", "res-0"])
+        self.assertEqual(self.top(f"?tag={self.tag.pk}"), ["res-2", "res-0"])
+        self.assertEqual(self.top("?board=trending")[-1], "res-2")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserRating.objects.filter(resource=third).delete()
+        self.assertEqual(self.top(), ["res-1", "res-0"])
+
+    def test_rescoring_upserts_and_never_fails_the_write(self):
+        first = self.resources[0]
+        before = LeaderboardEntry.objects.get(board="top", resource=first).pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(self.users[1])
+            self.client.post(f"/api/resources/rate/{first.pk}/", {"rating": 1})
+        # Rescored in place rather than deleted and created again.
+        self.assertEqual(
+            LeaderboardEntry.objects.get(board="top", resource=first).pk, before
+        )
+
+        with mock.patch(
+            "core.leaderboards.score_entries", side_effect=IntegrityError
+        ), self.assertLogs("core.leaderboards", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.force_authenticate(self.users[2])
+                response = self.client.post(
+                    f"/api/resources/rate/{first.pk}/", {"rating": 2}
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            UserRating.objects.filter(user=self.users[2], resource=first).exists()
+        )
+
+    def test_repairs_and_retagging_rescore_boards(self):
+        # Drifted aggregates put ``third`` on top until they are repaired.
+        Resource.objects.filter(pk=self.resources[2].pk).update(
+            rating_sum=100, rating_count=10
+        )
+        call_command("refresh_leaderboards", stdout=StringIO())
+        self.assertEqual(self.top()[0], "res-2")
+
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+        self.assertEqual(self.top(), ["res-1", "res-0", "res-2"])
+
+        rust = Tag.objects.create(external_id="t2", tag="Rust")
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_catalog(
+                [],
+                [
+                    {
+                        "id": "res-0",
+                        "author": "Author 0",
+                        "name": "Resource 0",
+                        "url": "https://example.com/0",
+                        "appliedTags": ["t2"],
+                    }
+                ],
+            )
+        self.assertEqual(self.top(f"?tag={self.tag.pk}"), ["res-2"])
+        self.assertEqual(self.top(f"?tag={rust.pk}"), ["res-0"])
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        self.resource = create_resources(1)[0]
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+
+    def test_cached_until_catalog_changes(self):
+        self.assertEqual(self.client.get("/api/resources/")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/resources/")["X-Cache"], "HIT")
+
+        UserRating.objects.create(user=self.user, resource=self.resource, rating=4)
+
+        response = self.client.get("/api/resources/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["avg_rating"], 4)
+
+    def test_ingest_invalidates_tags(self):
+        self.client.get("/api/tags/")
+
+        response = self.client.post(
+            "/api/upload-data/?wait=true",
+            {"tags": [{"id": "t1", "tag": "New"}], "resources": []},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/tags/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        tag = Tag.objects.get()
+        self.assertEqual(
+            response.data["results"],
+            [{"id": tag.pk, "external_id": "t1", "tag": "New"}],
+        )
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.resource = create_resources(1)[0]
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+
+    def test_resource_list_not_modified(self):
+        response = self.client.get("/api/resources/")
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/resources/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        response = self.client.get("/api/resources/?page=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        self.resource.name = "Renamed"
+        self.resource.save()
+        response = self.client.get("/api/resources/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_saved_resources_etag_is_per_user(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get("/api/resources/saved/")["ETag"]
+        response = self.client.get("/api/resources/saved/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        UserSavedResource.objects.create(
+            user=self.user, resource=self.resource, is_saved=True
+        )
+        response = self.client.get("/api/resources/saved/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+
+        other = CustomUser.objects.create_user("other@example.com", "other")
+        self.client.force_authenticate(other)
+        response = self.client.get("/api/resources/saved/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_control_headers(self):
+        def cache_headers(response):
+            return (
+                sorted(response["Cache-Control"].split(", ")),
+                response.get("Vary", ""),
+            )
+
+        response = self.client.get("/api/resources/")
+        self.assertEqual(cache_headers(response)[0], ["no-cache"])
+        self.assertNotIn("Cookie", cache_headers(response)[1])
+
+        self.client.force_authenticate(self.user)
+        for url in ("/api/resources/saved/", "/api/resources/?include_user_state=1"):
+            response = self.client.get(url)
+            etag = response["ETag"]
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(not_modified.status_code, 304)
+            for response in (response, not_modified):
+                cache_control, vary = cache_headers(response)
+                self.assertEqual(cache_control, ["no-cache", "private"], url)
+                self.assertIn("Cookie", vary, url)
+                self.assertIn("Authorization", vary, url)
+
+
+class UserStateTests(APITestCase):
+    def setUp(self):
+        self.resources = create_resources(3)
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+        UserSavedResource.objects.create(
+            user=self.user, resource=self.resources[0], is_saved=True
+        )
+        UserRating.objects.create(user=self.user, resource=self.resources[1], rating=4)
+
+    def test_overlay_on_cached_page(self):
+        self.client.get("/api/resources/?include_user_state=1")
+        self.client.force_authenticate(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/resources/?include_user_state=1")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [(item["is_saved"], item["my_rating"]) for item in response.data["results"]],
+            [(True, None), (False, 4), (False, None)],
+        )
+
+        etag = response["ETag"]
+        UserSavedResource.objects.filter(user=self.user).delete()
+        response = self.client.get(
+            "/api/resources/?include_user_state=1", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["results"][0]["is_saved"])
+
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/resources/?include_user_state=1")
+        self.assertNotIn("is_saved", response.data["results"][0])
+
+
+@override_settings(
+    REQUEST_METRICS=True,
+    REQUEST_QUERY_BUDGET=0,
+    REQUEST_QUERY_BUDGET_STRICT=False,
+    METRICS_TOKEN="scrape",
+)
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        create_resources(3, tags=[Tag.objects.create(external_id="t", tag="T")])
+        request_metrics.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/resources/")
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="3 queries", render;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    def test_aggregated_per_route(self):
+        self.client.get("/api/resources/")
+        self.client.get("/api/resources/")
+        self.client.get("/api/resources/search/", {"q": "resource"})
+
+        staff = CustomUser.objects.create_user("staff@example.com", "staff")
+        staff.is_staff = True
+        staff.save()
+        self.client.force_authenticate(staff)
+        views = {
+            (item["view"], item["method"]): item
+            for item in self.client.get("/api/metrics/").data["views"]
+        }
+
+        resources = views["api/resources/", "GET"]
+        self.assertEqual(resources["responses"], {"2xx": 2})
+        self.assertEqual(resources["queries"]["count"], 2)
+        # The second request is served from the catalog cache.
+        self.assertEqual(resources["queries"]["sum"], 3)
+        self.assertEqual(resources["queries"]["buckets"]["3"], 2)
+        self.assertEqual(resources["duration"]["buckets"]["+Inf"], 2)
+        self.assertIn(("api/resources/search/", "GET"), views)
+
+    def test_prometheus_format_with_token(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+
+        self.client.get("/api/resources/")
+        response = self.client.get(
+            "/api/metrics/",
+            HTTP_ACCEPT="text/plain;version=0.0.4",
+            HTTP_X_METRICS_TOKEN="scrape",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            'api_requests_total{view="api/resources/",method="GET",status="2xx"} 1',
+            body,
+        )
+        self.assertIn(
+            'api_request_queries_bucket{view="api/resources/",method="GET",le="+Inf"} 1',
+            body,
+        )
+        self.assertIn("# TYPE api_request_duration_seconds histogram", body)
+
+    def test_query_budget(self):
+        with mock.patch.object(ResourcesListAPIView, "query_budget", 2):
+            with self.assertLogs("api.middleware", "WARNING") as logs:
+                response = self.client.get("/api/resources/")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("ran 3 queries, over its budget of 2", logs.output[0])
+
+            with override_settings(REQUEST_QUERY_BUDGET_STRICT=True):
+                with self.assertRaises(QueryBudgetExceeded):
+                    # A different path, so it misses the catalog cache.
+                    self.client.get("/api/resources/", {"page": 1})
+
+        data = request_metrics.as_dict()["views"]
+        self.assertEqual(data[0]["over_budget"], 2)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        response = self.client.get("/api/resources/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(request_metrics.as_dict(), {"views": []})
+
+
+class FastJSONTests(APITestCase):
+    def test_renderer_matches_drf(self):
+        data = {
+            "aware": datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            "offset": datetime(
+                2024, 1, 2, tzinfo=dt_timezone(timedelta(hours=2))
+            ),
+            "naive": datetime(2024, 1, 2, 3, 4, 5),
+            "date": date(2024, 1, 2),
+            "decimal": Decimal("1.10"),
+            "uuid": uuid.UUID(int=1),
+            "text": "caf\u00e9 \u2028 \u2029",
+            1: [1.5, None, True, {"nested": (1, 2)}],
+        }
+        for payload in (data, [data], None, {"big": 2**70}):
+            self.assertEqual(
+                FastJSONRenderer().render(payload), JSONRenderer().render(payload)
+            )
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+    def test_parser_matches_drf(self):
+        body = json.dumps({"resources": [{"id": 1, "name": "caf\u00e9"}]}).encode()
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body))
+        )
+        for parser in (FastJSONParser(), JSONParser()):
+            with self.assertRaises(ParseError):
+                parser.parse(BytesIO(b'{"rating": NaN}'))
+
+
+class ResourceRowSerializerTests(APITestCase):
+    def test_output_matches_resource_serializer(self):
+        tags = [
+            Tag.objects.create(external_id=f"t{i}", tag=name)
+            for i, name in enumerate(["Zeta", "Alpha", "Mid"])
+        ]
+        user = CustomUser.objects.create_user("user@example.com", "user")
+        resources = create_resources(4, raters=[user])
+        resources[0].tags.set([tags[2], tags[0], tags[1]])
+        resources[1].tags.set([tags[1]])
+        resources[2].created_at = datetime(
+            2024, 5, 6, 7, 8, 9, 123456, tzinfo=dt_timezone.utc
+        )
+        resources[2].save()
+        UserRating.objects.filter(resource=resources[3]).delete()
+
+        expected = ResourceSerializer(
+            Resource.objects.prefetch_related(
+                Prefetch("tags", queryset=Tag.objects.order_by("id"))
+            ).order_by("id"),
+            many=True,
+        ).data
+        rows = ResourceRowSerializer(
+            Resource.objects.order_by("id").values(*ResourceRowSerializer.values)
+        ).data
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+        response = self.client.get("/api/resources/")
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]),
+            JSONRenderer().render(expected),
+        )
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.resources = create_resources(7)
+        for i, resource in enumerate(self.resources):
+            resource.created_at = (
+                None if i % 3 == 0 else f"2024-01-0{i % 2 + 1}T00:00:00Z"
+            )
+            resource.rating_avg = i % 2
+            resource.save()
+
+    def collect(self, ordering, query=""):
+        url = (
+            f"/api/resources/?pagination=cursor&page_size=2&ordering={ordering}{query}"
+        )
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            self.assertFalse(
+                any("COUNT(" in query["sql"] for query in queries.captured_queries)
+            )
+            ids += [item["id"] for item in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def test_walks_every_ordering_without_gaps(self):
+        def created(resource):
+            return resource.created_at.timestamp() if resource.created_at else 0
+
+        sort_keys = {
+            "id": lambda r: r.pk,
+            "-id": lambda r: -r.pk,
+            # Nulls come first ascending and last descending.
+            "created_at": lambda r: (r.created_at is not None, created(r), r.pk),
+            "-created_at": lambda r: (r.created_at is None, -created(r), -r.pk),
+            "rating": lambda r: (r.rating_avg, r.pk),
+            "-rating": lambda r: (-r.rating_avg, -r.pk),
+        }
+        for ordering, key in sort_keys.items():
+            expected = [r.pk for r in sorted(Resource.objects.all(), key=key)]
+            self.assertEqual(self.collect(ordering), expected, ordering)
+
+        # A tag filter pages through the matching ids without sending all of
+        # them to the database at once.
+        tag_index.version = None
+        tag = Tag.objects.create(external_id="t1", tag="Python")
+        tagged = Resource.objects.exclude(pk=self.resources[0].pk)
+        tag.resources.set(tagged)
+        with mock.patch.object(KeysetPagination, "id_batch_size", 2):
+            for ordering, key in sort_keys.items():
+                expected = [r.pk for r in sorted(tagged, key=key)]
+                with CaptureQueriesContext(connection) as queries:
+                    ids = self.collect(ordering, "&tags=Python")
+                self.assertEqual(ids, expected, ordering)
+                self.assertFalse(
+                    any(
+                        query["sql"].partition(" IN (")[2].partition(")")[0].count(",")
+                        > 1
+                        for query in queries.captured_queries
+                    ),
+                    ordering,
+                )
+
+    def test_page_number_mode_is_unchanged(self):
+        response = self.client.get("/api/resources/")
+        self.assertEqual(response.data["count"], 7)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/resources/?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+
+class ResourceSearchTests(APITestCase):
+    def setUp(self):
+        search_index.version = None
+        python = Tag.objects.create(external_id="t1", tag="Python")
+        for external_id, name, author, tags in (
+            ("r1", "Django for beginners", "Ada", [python]),
+            ("r2", "Learning Rust", "Grace", []),
+            ("r3", "Djangology", "Linus", []),
+        ):
+            resource = Resource.objects.create(
+                external_id=external_id, name=name, author=author, url="https://a.io"
+            )
+            resource.tags.set(tags)
+
+    def search(self, query):
+        response = self.client.get("/api/resources/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [item["external_id"] for item in response.data["results"]]
+
+    def test_prefix_match_ranks_whole_words_first(self):
+        self.assertEqual(self.search("django"), ["r1", "r3"])
+        self.assertEqual(self.search("djan pyth"), ["r1"])
+        self.assertEqual(self.search("grace"), ["r2"])
+        self.assertEqual(self.search(""), [])
+
+    def test_ingest_updates_index_incrementally(self):
+        self.assertEqual(self.search("haskell"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/upload-data/?wait=true",
+                {
+                    "tags": [{"id": "t1", "tag": "Haskell"}],
+                    "resources": [
+                        {
+                            "id": "r4",
+                            "author": "Simon",
+                            "name": "Real World Haskell",
+                            "url": "https://b.io",
+                        }
+                    ],
+                },
+                format="json",
+            )
+
+        version = search_index.version
+        self.assertEqual(self.search("haskell"), ["r1", "r4"])
+        self.assertEqual(search_index.version, version)
+
+    def test_mysql_uses_fulltext_index(self):
+        with mock.patch.object(connection, "vendor", "mysql"):
+            sql = str(search("Djan, pyth!").query)
+        self.assertIn(
+            "MATCH (search_document) AGAINST (+djan* +pyth* IN BOOLEAN MODE)", sql
+        )
+
+
+class CatalogIngestTests(APITestCase):
+    TAGS = [{"id": "t1", "tag": "Python"}, {"id": "t2", "tag": "Django"}]
+
+    def resources(self, **applied_tags):
+        return [
+            {
+                "id": f"r{i}",
+                "author": "Ada",
+                "name": f"Resource {i}",
+                "url": f"https://example.com/{i}",
+                "appliedTags": applied_tags.get(f"r{i}", ["t1"]),
+            }
+            for i in range(3)
+        ]
+
+    def stale(self):
+        return list(
+            Resource.objects.filter(is_stale=True)
+            .order_by("external_id")
+            .values_list("external_id", flat=True)
+        )
+
+    def tag_links(self):
+        links = {}
+        for external_id, tag in Resource.tags.through.objects.order_by(
+            "tag__external_id"
+        ).values_list("resource__external_id", "tag__external_id"):
+            links.setdefault(external_id, []).append(tag)
+        return links
+
+    def test_first_load_and_idempotent_rerun(self):
+        summary = ingest_catalog(self.TAGS, self.resources(r0=["t1", "t2"]))
+        self.assertEqual(
+            summary,
+            {
+                "tags": {"created": 2, "updated": 0, "unchanged": 0},
+                "resources": {"created": 3, "updated": 0, "unchanged": 0},
+            },
+        )
+        self.assertEqual(
+            self.tag_links(), {"r0": ["t1", "t2"], "r1": ["t1"], "r2": ["t1"]}
+        )
+        self.assertEqual(
+            Resource.objects.get(external_id="r0").search_document,
+            "resource 0 ada python django",
+        )
+
+        summary = ingest_catalog(self.TAGS, self.resources(r0=["t1", "t2"]))
+        self.assertEqual(
+            summary,
+            {
+                "tags": {"created": 0, "updated": 0, "unchanged": 2},
+                "resources": {"created": 0, "updated": 0, "unchanged": 3},
+            },
+        )
+        self.assertEqual(Resource.objects.count(), 3)
+        self.assertEqual(Resource.tags.through.objects.count(), 4)
+
+    def test_retag_diffs_tag_links(self):
+        ingest_catalog(self.TAGS, self.resources(r0=["t1", "t2"]))
+        kept = Resource.tags.through.objects.get(
+            resource__external_id="r0", tag__external_id="t2"
+        )
+
+        summary = ingest_catalog(self.TAGS, self.resources(r0=["t2"], r1=["t1", "t2"]))
+
+        self.assertEqual(
+            summary["resources"], {"created": 0, "updated": 2, "unchanged": 1}
+        )
+        self.assertEqual(
+            self.tag_links(), {"r0": ["t2"], "r1": ["t1", "t2"], "r2": ["t1"]}
+        )
+        # Links that stay are left alone rather than deleted and re-added.
+        self.assertTrue(Resource.tags.through.objects.filter(pk=kept.pk).exists())
+
+    def test_tag_rename_rewrites_search_documents(self):
+        ingest_catalog(self.TAGS, self.resources(r0=["t1", "t2"]))
+
+        summary = ingest_catalog(
+            [{"id": "t1", "tag": "Python 3"}, {"id": "t2", "tag": "Django"}],
+            self.resources(r0=["t1", "t2"]),
+        )
+
+        self.assertEqual(summary["tags"], {"created": 0, "updated": 1, "unchanged": 1})
+        self.assertEqual(summary["resources"]["unchanged"], 3)
+        self.assertEqual(
+            dict(Resource.objects.values_list("external_id", "search_document")),
+            {
+                "r0": "resource 0 ada python 3 django",
+                "r1": "resource 1 ada python 3",
+                "r2": "resource 2 ada python 3",
+            },
+        )
+
+
+    def test_unchanged_rows_are_not_written(self):
+        ingest_catalog(self.TAGS, self.resources())
+
+        with CaptureQueriesContext(connection) as queries:
+            ingest_catalog(self.TAGS, self.resources())
+
+        writes = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+
+    def test_mark_stale_and_revival(self):
+        ingest_catalog(self.TAGS, self.resources())
+
+        summary = ingest_catalog(self.TAGS, self.resources()[:1], mark_stale=True)
+        self.assertEqual(summary["resources"]["stale"], 2)
+        self.assertEqual(self.stale(), ["r1", "r2"])
+
+        # Unchanged rows that show up again come back to life.
+        summary = ingest_catalog(self.TAGS, self.resources()[1:], mark_stale=True)
+        self.assertEqual(
+            summary["resources"],
+            {"created": 0, "updated": 0, "unchanged": 2, "stale": 1},
+        )
+        self.assertEqual(self.stale(), ["r0"])
+
+        summary = ingest_catalog(self.TAGS, self.resources()[1:])
+        self.assertNotIn("stale", summary["resources"])
+        self.assertEqual(self.stale(), ["r0"])
+
+
+class JSONStreamTests(APITestCase):
+    DOCUMENT = (
+        '\ufeff [ {"id": 1, "name": "caf\u00e9 \\"[quoted]\\" \u2603", "tags": []},'
+        ' 12345.5e-3 , -7, "\u00fcber", [1, [2, {"a": null}]], true, false,'
+        ' null, "a,]b" ]\n'
+    )
+
+    def parse(self, text, chunk_size):
+        return list(iter_json_array(BytesIO(text.encode()), chunk_size=chunk_size))
+
+    def test_every_chunk_boundary(self):
+        expected = json.loads(self.DOCUMENT.lstrip("\ufeff"))
+        size = len(self.DOCUMENT.encode())
+        for chunk_size in range(1, size + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(self.DOCUMENT, chunk_size), expected)
+
+    def test_empty_array(self):
+        self.assertEqual(self.parse(" [ ] ", 1), [])
+        self.assertEqual(self.parse("[]", 64), [])
+
+    def test_malformed_input(self):
+        for text in ("", "{}", "[1 2]", "[1,]", "[1, 2", '["open', "[1, {]"):
+            for chunk_size in (1, 3, 64):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(json.JSONDecodeError):
+                        self.parse(text, chunk_size)
+
+
+class SyncResourcesCommandTests(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+        return path
+
+    def sync(self, tags, resources, *args):
+        stdout = StringIO()
+        call_command(
+            "sync_resources",
+            "--tags",
+            self.write("tags.json", tags),
+            "--resources",
+            self.write("resources.json", resources),
+            *args,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_sync_from_local_files(self):
+        resources = [
+            {
+                "id": i,
+                "author": "Ada",
+                "name": f"Resource {i}",
+                "url": f"https://example.com/{i}",
+                "appliedTags": [1],
+            }
+            for i in range(5)
+        ]
+        output = self.sync([{"id": 1, "tag": "Python"}], resources, "--batch-size", "2")
+
+        self.assertIn("tags: created=1, updated=0, unchanged=0", output)
+        self.assertIn("resources: created=5, updated=0, unchanged=0", output)
+        self.assertEqual(Resource.objects.filter(tags__tag="Python").count(), 5)
+
+        output = self.sync([{"id": 1, "tag": "Python"}], resources[:3], "--mark-stale")
+        self.assertIn("resources: created=0, updated=0, unchanged=3, stale=2", output)
+
+    def test_invalid_input_rolls_back(self):
+        with self.assertRaisesMessage(CommandError, "Invalid JSON"):
+            self.sync([{"id": 1, "tag": "Python"}], "[{}")
+        self.assertFalse(Tag.objects.exists())
+
+        with self.assertRaisesMessage(CommandError, "Failed to open"):
+            call_command(
+                "sync_resources",
+                "--tags",
+                os.path.join(self.directory.name, "missing.json"),
+                stdout=StringIO(),
+            )
+
+
+class CacheCheckTests(APITestCase):
+    def test_process_local_cache_is_flagged_for_deploy(self):
+        with override_settings(CACHES=LOCAL_CACHE):
+            self.assertEqual(
+                [error.id for error in check_shared_cache(None)], ["core.W001"]
+            )
+        with override_settings(CACHES=SHARED_CACHE):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class JobQueueTests(SharedCacheMixin, APITestCase):
+    def upload(self, count, query="batch_size=2"):
+        return self.client.post(
+            f"/api/upload-data/?{query}",
+            {
+                "tags": [{"id": "t1", "tag": "Python"}],
+                "resources": [
+                    {
+                        "id": f"r{i}",
+                        "author": "Ada",
+                        "name": f"Resource {i}",
+                        "url": f"https://example.com/{i}",
+                        "appliedTags": ["t1"],
+                    }
+                    for i in range(count)
+                ],
+            },
+            format="json",
+        )
+
+    def run_jobs(self, *args):
+        call_command("run_jobs", "--once", *args, stdout=StringIO())
+
+    def test_upload_queues_job_and_worker_runs_it(self):
+        response = self.upload(5)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], Job.QUEUED)
+        self.assertEqual(Resource.objects.count(), 0)
+        self.assertEqual(self.client.get("/api/resources/").data["count"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_jobs()
+
+        listing = self.client.get("/api/resources/?tags=Python")
+        self.assertEqual((listing["X-Cache"], listing.data["count"]), ("MISS", 5))
+
+        response = self.client.get(response.data["status_url"])
+        self.assertEqual(response.data["status"], Job.SUCCEEDED)
+        self.assertEqual((response.data["progress"], response.data["total"]), (5, 5))
+        self.assertEqual(response.data["result"]["resources"]["created"], 5)
+        self.assertNotIn("payload", response.data)
+        self.assertEqual(Job.objects.get().payload, {})
+        self.assertEqual(Resource.objects.filter(tags__tag="Python").count(), 5)
+
+    def test_worker_refuses_process_local_cache(self):
+        with override_settings(CACHES=LOCAL_CACHE):
+            with self.assertRaisesMessage(CommandError, "shared"):
+                self.run_jobs()
+
+    def test_wait_runs_job_in_request(self):
+        response = self.upload(3, "wait=true")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["resources"]["created"], 3)
+
+        with self.assertLogs("core.jobs", "ERROR"):
+            response = self.client.post(
+                "/api/upload-data/?wait=true",
+                {"resources": [{"id": "r9"}]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 500)
+        job = Job.objects.get(pk=response.data["job_id"])
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("KeyError", job.error)
+
+    def test_reclaimed_job_resumes_from_checkpoint(self):
+        job_id = self.upload(5).data["job_id"]
+        ingest_resources = CatalogIngest.ingest_resources
+        batches = []
+
+        def crash_on_second_batch(ingest, resources):
+            batches.append([item["id"] for item in resources])
+            if len(batches) == 2:
+                raise KeyboardInterrupt
+            ingest_resources(ingest, resources)
+
+        with mock.patch.object(
+            CatalogIngest, "ingest_resources", crash_on_second_batch
+        ), self.assertRaises(KeyboardInterrupt):
+            self.run_jobs()
+
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.progress), (Job.RUNNING, 2))
+        self.assertEqual(Resource.objects.count(), 2)
+
+        # The heartbeat is still fresh, so no other worker takes the job yet.
+        self.run_jobs()
+        self.assertEqual(Job.objects.get(pk=job_id).status, Job.RUNNING)
+
+        with mock.patch.object(
+            CatalogIngest, "ingest_resources", crash_on_second_batch
+        ):
+            self.run_jobs("--stale-after", "0")
+
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 2))
+        self.assertEqual(batches[2:], [["r2", "r3"], ["r4"]])
+        self.assertEqual(job.result["resources"]["created"], 5)
+        self.assertEqual(Resource.objects.count(), 5)
+
+    def test_claim_is_exclusive_and_gives_up_after_max_attempts(self):
+        job = enqueue("rebuild_ratings")
+        self.assertEqual(claim("a").pk, job.pk)
+        self.assertIsNone(claim("b"))
+
+        stale = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=stale)
+        self.assertEqual(claim("b").worker, "b")
+        with self.assertRaises(JobLost):
+            JobRun(job, "a").checkpoint({})
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=stale)
+        self.assertEqual(claim("c").attempts, 3)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=stale)
+        self.assertIsNone(claim("d"))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.FAILED)
+
+    def test_rebuild_jobs(self):
+        user = CustomUser.objects.create_user("user@example.com", "user")
+        resources = create_resources(3, raters=[user])
+        Resource.objects.update(
+            rating_sum=0, rating_count=0, rating_avg=0, search_document=""
+        )
+
+        call_command(
+            "enqueue_job", "rebuild_ratings", "--batch-size", "2", stdout=StringIO()
+        )
+        call_command("enqueue_job", "rebuild_indexes", stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_jobs()
+
+        jobs = Job.objects.order_by("pk")
+        self.assertEqual(
+            [(job.status, job.progress, job.total) for job in jobs],
+            [(Job.SUCCEEDED, 3, 3)] * 2,
+        )
+        call_command("rebuild_rating_aggregates", "--verify", stdout=StringIO())
+        self.assertTrue(all(Resource.objects.values_list("search_document", flat=True)))
+        self.assertEqual(list(search("resource 1")), [resources[1].pk])
+
+
+class TagFilterTests(APITestCase):
+    def setUp(self):
+        tag_index.version = None
+        self.python, self.django, self.rust = [
+            Tag.objects.create(external_id=f"t{i}", tag=name)
+            for i, name in enumerate(["Python", "Django", "Rust"])
+        ]
+        self.resources = create_resources(4)
+        self.resources[0].tags.set([self.python, self.django])
+        self.resources[1].tags.set([self.python])
+        self.resources[2].tags.set([self.rust])
+
+    def filter(self, query):
+        response = self.client.get(f"/api/resources/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [item["external_id"] for item in response.data["results"]]
+
+    def test_match_all_and_any(self):
+        self.assertEqual(self.filter("tags=Python"), ["res-0", "res-1"])
+        self.assertEqual(self.filter("tags=Python,Django"), ["res-0"])
+        self.assertEqual(self.filter("tags=Python,Missing"), [])
+        self.assertEqual(
+            self.filter("tags=Django,Rust&tag_match=any"), ["res-0", "res-2"]
+        )
+        self.assertEqual(
+            self.filter("tags=Python&pagination=cursor&ordering=-id"),
+            ["res-1", "res-0"],
+        )
+
+    def test_index_follows_retagging(self):
+        self.assertEqual(self.filter("tags=Rust"), ["res-2"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resources[3].tags.add(self.rust)
+            self.resources[2].tags.clear()
+        version = tag_index.version
+
+        self.assertEqual(self.filter("tags=Rust"), ["res-3"])
+        self.assertEqual(tag_index.version, version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rust.tag = "Rustlang"
+            self.rust.save()
+        self.assertEqual(self.filter("tags=Rustlang"), ["res-3"])
+
+
+@override_settings(JWT_STATELESS_USER=True)
+class StatelessJWTTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.user))
+
+    def test_check_refuses_process_local_cache(self):
+        with override_settings(CACHES=LOCAL_CACHE):
+            self.assertEqual(
+                [error.id for error in check_stateless_user_cache(None)],
+                ["core.E002"],
+            )
+        with override_settings(CACHES=SHARED_CACHE):
+            self.assertEqual(check_stateless_user_cache(None), [])
+        with override_settings(JWT_STATELESS_USER=False):
+            self.assertEqual(check_stateless_user_cache(None), [])
+
+    def test_saved_resources_skip_user_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/resources/saved/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            any("core_customuser" in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/resources/saved/")
+        self.assertEqual(response.status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.get("/api/resources/saved/")
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncViewsTests(APITestCase):
+    def setUp(self):
+        tags = [
+            Tag.objects.create(external_id=f"tag-{i}", tag=f"Tag {i}") for i in range(2)
+        ]
+        create_resources(3, tags=tags)
+        self.user = CustomUser.objects.create_user(
+            "user@example.com", "user", password="secret-password"
+        )
+
+    def assertSamePage(self, sync_path, async_path):
+        expected = self.client.get(sync_path)
+        response = self.client.get(async_path)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(
+            response.content.decode().replace("/api/async/", "/api/"),
+            expected.content.decode(),
+        )
+
+    def test_catalog_matches_sync_views(self):
+        self.assertSamePage("/api/resources/", "/api/async/resources/")
+        self.assertSamePage("/api/tags/", "/api/async/tags/")
+
+        with mock.patch.object(PageNumberPagination, "page_size", 2):
+            for page in ("1", "2", "3", "x"):
+                self.assertSamePage(
+                    f"/api/resources/?page={page}", f"/api/async/resources/?page={page}"
+                )
+
+    async def test_served_from_catalog_cache(self):
+        response = await self.async_client.get("/api/async/resources/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        response = await self.async_client.get("/api/async/resources/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    def test_login_and_check_auth(self):
+        response = self.client.post(
+            "/api/async/auth/login/",
+            {"email": "user@example.com", "password": "wrong"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            "/api/async/auth/login/",
+            {"email": "user@example.com", "password": "secret-password"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        refresh = response.cookies["refresh_token"].value
+
+        response = self.client.get("/api/async/auth/check-auth/")
+        self.assertEqual(response.json(), {"message": "Access token valid"})
+
+        self.client.cookies["access_token"] = "expired"
+        response = self.client.get("/api/async/auth/check-auth/")
+        self.assertEqual(response.json(), {"message": "Access token refreshed!"})
+        self.assertNotEqual(response.cookies["refresh_token"].value, refresh)
+        jti = RefreshToken(refresh, verify=False)["jti"]
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=jti).exists())
+
+        self.client.cookies["access_token"] = "expired"
+        self.client.cookies["refresh_token"] = refresh
+        response = self.client.get("/api/async/auth/check-auth/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_google_auth(self):
+        with mock.patch(
+            "api.async_views.verify_google_id_token",
+            return_value={"email": "new@example.com", "name": "New"},
+        ) as verify:
+            response = self.client.post(
+                "/api/async/auth/google/", {"token": "id-token"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(verify.call_args.args[0], "id-token")
+        self.assertIn("access_token", response.cookies)
+        user = CustomUser.objects.get(email="new@example.com")
+        self.assertFalse(user.has_usable_password())
+
+        with mock.patch(
+            "api.async_views.verify_google_id_token", side_effect=ValueError
+        ):
+            response = self.client.post(
+                "/api/async/auth/google/", {"token": "id-token"}, format="json"
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(JWT_BLACKLIST_FILTER=True)
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        blacklist_filter.version = None
+        self.user = CustomUser.objects.create_user("user@example.com", "user")
+
+    def test_filter_answers_unknown_tokens_without_database(self):
+        refresh = RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            RefreshToken.for_user(self.user).blacklist()
+        RefreshToken(str(refresh))
+
+        with CaptureQueriesContext(connection) as queries:
+            RefreshToken(str(refresh))
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh.blacklist()
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_blacklisting_is_seen_before_commit(self):
+        refresh = RefreshToken.for_user(self.user)
+        RefreshToken(str(refresh))
+
+        # The on-commit callbacks never run inside this test's transaction.
+        refresh.blacklist()
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_filter_of_another_process_catches_up(self):
+        other = BlacklistFilter()
+        refresh = RefreshToken.for_user(self.user)
+        self.assertFalse(other.is_blacklisted(refresh["jti"]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh.blacklist()
+        self.assertTrue(other.is_blacklisted(refresh["jti"]))
+
+    def test_check_refuses_process_local_cache(self):
+        with override_settings(CACHES=LOCAL_CACHE):
+            self.assertEqual(
+                [error.id for error in check_blacklist_filter_cache(None)],
+                ["core.E001"],
+            )
+        with override_settings(CACHES=SHARED_CACHE):
+            self.assertEqual(check_blacklist_filter_cache(None), [])
+        with override_settings(JWT_BLACKLIST_FILTER=False):
+            self.assertEqual(check_blacklist_filter_cache(None), [])
+
+    def test_prune_removes_expired_tokens(self):
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        live = RefreshToken.for_user(self.user)
+        OutstandingToken.objects.filter(jti=expired["jti"]).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+
+        call_command("prune_tokens", "--batch-size", "1", stdout=StringIO())
+
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), [live["jti"]]
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class GoogleIdTokenTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        public_key, private_key = rsa.newkeys(1024)
+        cls.signer = crypt.RSASigner.from_string(private_key.save_pkcs1(), "key-1")
+        certs = json.dumps({"key-1": public_key.save_pkcs1().decode()}).encode()
+
+        class CertsHandler(BaseHTTPRequestHandler):
+            hits = 0
+
+            def do_GET(self):
+                CertsHandler.hits += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", "public, max-age=300")
+                self.end_headers()
+                self.wfile.write(certs)
+
+            def log_message(self, *args):
+                pass
+
+        cls.handler = CertsHandler
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), CertsHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.certs_url = f"http://127.0.0.1:{cls.server.server_port}/certs"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.handler.hits = 0
+        self.now = 0
+        self.request = CachedRequest(clock=lambda: self.now)
+
+    def make_token(self, **claims):
+        issued = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": "client-id",
+            "email": "user@example.com",
+            "iat": issued,
+            "exp": issued + 3600,
+            **claims,
+        }
+        return jwt.encode(self.signer, payload)
+
+    def verify(self, token):
+        return verify_google_id_token(
+            token, "client-id", certs_url=self.certs_url, request=self.request
+        )
+
+    def test_certificates_reused_until_max_age(self):
+        self.assertEqual(self.verify(self.make_token())["email"], "user@example.com")
+        self.verify(self.make_token())
+        self.assertEqual(self.handler.hits, 1)
+
+        self.now = 301
+        self.verify(self.make_token())
+        self.assertEqual(self.handler.hits, 2)
+
+    def test_rejects_wrong_audience_and_issuer(self):
+        with self.assertRaises(ValueError):
+            self.verify(self.make_token(aud="someone-else"))
+        with self.assertRaises(ValueError):
+            self.verify(self.make_token(iss="https://evil.example.com"))
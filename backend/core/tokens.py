@@ -0,0 +1,42 @@
+"""
+JWT classes that carry the user's identity claims.
+
+``username``, ``is_staff`` and ``is_superuser`` are signed into every
+token so ``CookieJWTAuthentication`` can build the request user from the
+token alone when ``JWT_STATELESS_USER`` is enabled. Refresh tokens check
+the blacklist through ``core.blacklist`` when ``JWT_BLACKLIST_FILTER`` is.
+"""
+
+from django.conf import settings
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from .blacklist import blacklist_filter
+
+
+USER_CLAIMS = ("username", "is_staff", "is_superuser")
+
+
+class UserClaimsMixin:
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class AccessToken(UserClaimsMixin, tokens.AccessToken):
+    pass
+
+
+class RefreshToken(UserClaimsMixin, tokens.RefreshToken):
+    # ``refresh.access_token`` copies the claims over.
+    access_token_class = AccessToken
+
+    def check_blacklist(self):
+        if not settings.JWT_BLACKLIST_FILTER:
+            return super().check_blacklist()
+        if blacklist_filter.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
@@ -0,0 +1,73 @@
+from django.db import connection
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """
+    Insert ``objs``, updating ``update_fields`` of the rows that already
+    exist with the same ``unique_fields``.
+
+    MySQL cannot name the conflict target; its ON DUPLICATE KEY UPDATE
+    fires on any unique key, which is the same thing for models whose only
+    other unique key is the primary key. Backends without upserts update
+    the existing rows and create the rest.
+    """
+    features = connection.features
+    if features.supports_update_conflicts_with_target:
+        model.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields,
+            batch_size=batch_size,
+        )
+    elif features.supports_update_conflicts:
+        model.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            update_fields=update_fields,
+            batch_size=batch_size,
+        )
+    else:
+        _update_then_create(model, objs, unique_fields, update_fields, batch_size)
+
+
+def _update_then_create(model, objs, unique_fields, update_fields, batch_size):
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+
+    def key(obj):
+        return tuple(getattr(obj, attname) for attname in attnames)
+
+    lookup = {
+        f"{attname}__in": {getattr(obj, attname) for obj in objs}
+        for attname in attnames
+    }
+    existing = {
+        tuple(row[:-1]): row[-1]
+        for row in model.objects.filter(**lookup).values_list(*attnames, "pk")
+    }
+
+    to_update = []
+    to_create = []
+    for obj in objs:
+        pk = existing.get(key(obj))
+        if pk is None:
+            to_create.append(obj)
+        else:
+            obj.pk = pk
+            to_update.append(obj)
+
+    if to_update:
+        model.objects.bulk_update(to_update, update_fields, batch_size=batch_size)
+    if to_create:
+        model.objects.bulk_create(to_create, batch_size=batch_size)